@@ -6,11 +6,18 @@
 
 import os
 import sys
+import json
+import time
+import hashlib
 import logging
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 try:
     import dropbox
+    import requests
     from dropbox.exceptions import ApiError, AuthError
 except ImportError:
     print("❌ Модуль dropbox не установлен")
@@ -25,13 +32,311 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# ========================================================================
+# ТОКЕН И ОБЩИЙ КЛИЕНТ
+# ========================================================================
+
+TOKEN_URL = 'https://api.dropbox.com/oauth2/token'
+
+# Токен из кэша берётся, только если до истечения больше этого запаса (сек)
+TOKEN_REFRESH_MARGIN = 300
+
+
+class DropboxTokenError(RuntimeError):
+    """Не удалось получить access токен Dropbox"""
+
+
+def token_cache_path() -> str:
+    """Файл кэша access токена (DROPBOX_TOKEN_CACHE или ~/.cache/severen/)"""
+    return os.getenv('DROPBOX_TOKEN_CACHE') or \
+        os.path.expanduser('~/.cache/severen/dropbox_token.json')
+
+
+def _credentials_key(app_key: str, refresh_token: str) -> str:
+    """Отпечаток учётных данных: кэш другого приложения/токена не подходит"""
+    return hashlib.sha256(f"{app_key}:{refresh_token}".encode('utf-8')).hexdigest()[:16]
+
+
+def load_cached_token(app_key: str, refresh_token: str) -> Optional[dict]:
+    """
+    Access токен из кэша, если он выдан для этих учётных данных и не истекает
+
+    Returns:
+        {'access_token', 'expires_at'} или None
+    """
+    try:
+        with open(token_cache_path(), encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('credentials') != _credentials_key(app_key, refresh_token):
+        return None
+    if cached.get('expires_at', 0) - time.time() <= TOKEN_REFRESH_MARGIN:
+        return None
+    return cached
+
+
+def save_cached_token(app_key: str, refresh_token: str, access_token: str, expires_at: float):
+    """Сохранение access токена в кэш (права 0600, запись через временный файл)"""
+    path = token_cache_path()
+    tmp_path = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({
+                'credentials': _credentials_key(app_key, refresh_token),
+                'access_token': access_token,
+                'expires_at': expires_at,
+            }, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"⚠️ Кэш токена Dropbox не сохранён: {e}")
+
+
+def fetch_access_token(app_key: str, app_secret: str, refresh_token: str) -> tuple:
+    """
+    Обмен refresh токена на access токен (OAuth2)
+
+    Returns:
+        (access_token, expires_at - unix time)
+    """
+    response = requests.post(TOKEN_URL, data={
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token,
+        'client_id': app_key,
+        'client_secret': app_secret,
+    }, timeout=30)
+
+    if response.status_code != 200:
+        raise DropboxTokenError(f"Dropbox API: {response.status_code}\n{response.text}")
+
+    data = response.json()
+    return data['access_token'], time.time() + data.get('expires_in', 14400)
+
+
+_client_lock = threading.Lock()
+_session = None
+_clients = {}
+
+
+def shared_session():
+    """Общая HTTP сессия с пулом соединений для всех клиентов Dropbox"""
+    global _session
+    if _session is None:
+        _session = dropbox.create_session(
+            max_connections=int(os.getenv('DROPBOX_MAX_CONNECTIONS', '8'))
+        )
+    return _session
+
+
+def create_dropbox_client(app_key: str = None, app_secret: str = None,
+                          refresh_token: str = None) -> dropbox.Dropbox:
+    """
+    Общий клиент Dropbox: токен из кэша, пул соединений, обновление у истечения
+
+    Access токен берётся из кэша (token_cache_path), OAuth запрос делается
+    только если кэша нет или токен скоро истечёт. Дальше токен обновляет
+    сам SDK - по refresh токену, когда подходит срок. В пределах процесса
+    клиент один на учётные данные.
+
+    Args:
+        app_key, app_secret, refresh_token: По умолчанию DROPBOX_* из окружения
+
+    Raises:
+        DropboxTokenError: Нет учётных данных или OAuth запрос не удался
+    """
+    app_key = app_key or os.getenv('DROPBOX_APP_KEY')
+    app_secret = app_secret or os.getenv('DROPBOX_APP_SECRET')
+    refresh_token = refresh_token or os.getenv('DROPBOX_REFRESH_TOKEN')
+
+    if not all([app_key, app_secret, refresh_token]):
+        raise DropboxTokenError("DROPBOX_* переменные не найдены в .env")
+
+    key = _credentials_key(app_key, refresh_token)
+    with _client_lock:
+        if key in _clients:
+            return _clients[key]
+
+        cached = load_cached_token(app_key, refresh_token)
+        if cached:
+            access_token, expires_at = cached['access_token'], cached['expires_at']
+            logger.info(f"⚡ Access токен Dropbox из кэша "
+                        f"(действует ещё {(expires_at - time.time()) / 60:.0f} мин)")
+        else:
+            access_token, expires_at = fetch_access_token(app_key, app_secret, refresh_token)
+            save_cached_token(app_key, refresh_token, access_token, expires_at)
+            logger.info("✅ Access токен Dropbox получен по refresh токену")
+
+        client = dropbox.Dropbox(
+            oauth2_access_token=access_token,
+            oauth2_access_token_expiration=datetime.utcfromtimestamp(expires_at),
+            oauth2_refresh_token=refresh_token,
+            app_key=app_key,
+            app_secret=app_secret,
+            session=shared_session(),
+        )
+        _clients[key] = client
+        return client
+
+
+# ========================================================================
+# ПАКЕТНЫЕ ЗАГРУЗКИ И СКАЧИВАНИЯ
+# ========================================================================
+
+# Dropbox content_hash: sha256 блоков по 4 MB
+CONTENT_HASH_BLOCK = 4 * 1024 * 1024
+
+# Размер части файла в upload session и лимит файлов в одном finish_batch
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+FINISH_BATCH_LIMIT = 1000
+
+
+def content_hash(local_path: str) -> str:
+    """content_hash файла в формате Dropbox (как FileMetadata.content_hash)"""
+    blocks = hashlib.sha256()
+    with open(local_path, 'rb') as f:
+        for block in iter(lambda: f.read(CONTENT_HASH_BLOCK), b''):
+            blocks.update(hashlib.sha256(block).digest())
+    return blocks.hexdigest()
+
+
+def load_transfer_manifest(manifest_path: Optional[str]) -> Dict[str, str]:
+    """Манифест загрузок: путь в Dropbox → content_hash последней загрузки"""
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Манифест загрузок не прочитан: {e}")
+        return {}
+
+
+def save_transfer_manifest(manifest_path: str, manifest: Dict[str, str]):
+    """Сохранение манифеста загрузок (через временный файл)"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _upload_session(dbx: dropbox.Dropbox, local_path: str):
+    """Содержимое файла в upload session (частями); сессия закрыта, не зафиксирована"""
+    size = os.path.getsize(local_path)
+    with open(local_path, 'rb') as f:
+        chunk = f.read(UPLOAD_CHUNK_SIZE)
+        session = dbx.files_upload_session_start(chunk, close=f.tell() >= size)
+        cursor = dropbox.files.UploadSessionCursor(session.session_id, offset=f.tell())
+        while cursor.offset < size:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            dbx.files_upload_session_append_v2(chunk, cursor, close=f.tell() >= size)
+            cursor.offset = f.tell()
+    return cursor
+
+
+def upload_batch(dbx: dropbox.Dropbox, files: List[Tuple[str, str]],
+                 manifest_path: Optional[str] = None, max_workers: int = 8) -> Dict[str, List[str]]:
+    """
+    Пакетная загрузка файлов в Dropbox
+
+    Содержимое файлов уходит параллельно (upload sessions), фиксируются все
+    файлы одним files_upload_session_finish_batch_v2. Файлы, content_hash
+    которых совпадает с манифестом, не загружаются.
+
+    Args:
+        dbx: Клиент Dropbox
+        files: Пары (локальный путь, путь в Dropbox)
+        manifest_path: Манифест загрузок (None - загружать всё)
+        max_workers: Одновременных загрузок
+
+    Returns:
+        {'uploaded': [...], 'unchanged': [...], 'failed': [...]} - пути в Dropbox
+    """
+    manifest = load_transfer_manifest(manifest_path)
+    report = {'uploaded': [], 'unchanged': [], 'failed': []}
+
+    pending = []
+    for local_path, remote_path in files:
+        digest = content_hash(local_path)
+        if manifest.get(remote_path) == digest:
+            report['unchanged'].append(remote_path)
+        else:
+            pending.append((local_path, remote_path, digest))
+
+    if pending:
+        logger.info(f"Пакетная загрузка в Dropbox: {len(pending)} файл(ов), "
+                    f"без изменений: {len(report['unchanged'])}")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            cursors = list(pool.map(lambda item: _upload_session(dbx, item[0]), pending))
+
+        for start in range(0, len(pending), FINISH_BATCH_LIMIT):
+            part = list(zip(pending, cursors))[start:start + FINISH_BATCH_LIMIT]
+            entries = [
+                dropbox.files.UploadSessionFinishArg(
+                    cursor=cursor,
+                    commit=dropbox.files.CommitInfo(
+                        path=remote_path, mode=dropbox.files.WriteMode.overwrite, mute=True
+                    ),
+                )
+                for (_, remote_path, _), cursor in part
+            ]
+            result = dbx.files_upload_session_finish_batch_v2(entries)
+            for ((_, remote_path, digest), _), entry in zip(part, result.entries):
+                if entry.is_success():
+                    manifest[remote_path] = digest
+                    report['uploaded'].append(remote_path)
+                else:
+                    logger.error(f"❌ Не загружен {remote_path}: {entry.get_failure()}")
+                    report['failed'].append(remote_path)
+
+    if manifest_path and report['uploaded']:
+        save_transfer_manifest(manifest_path, manifest)
+
+    logger.info(f"✅ Загружено: {len(report['uploaded'])}, без изменений: "
+                f"{len(report['unchanged'])}, ошибок: {len(report['failed'])}")
+    return report
+
+
+def download_batch(dbx: dropbox.Dropbox, files: List[Tuple[str, str]],
+                   max_workers: int = 8) -> Dict[str, bool]:
+    """
+    Параллельное скачивание файлов из Dropbox
+
+    Args:
+        files: Пары (путь в Dropbox, локальный путь)
+
+    Returns:
+        Путь в Dropbox → True, если скачан
+    """
+    def download(item):
+        remote_path, local_path = item
+        try:
+            folder = os.path.dirname(local_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            dbx.files_download_to_file(local_path, remote_path)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка скачивания {remote_path}: {e}")
+            return False
+
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as pool:
+        results = list(pool.map(download, files))
+    return {remote_path: ok for (remote_path, _), ok in zip(files, results)}
+
+
 class DropboxSync:
     """Синхронизация файлов с Dropbox"""
     
-    def __init__(self, token: str):
+    def __init__(self, token: Optional[str] = None):
         """
         Args:
-            token: Dropbox API токен
+            token: Dropbox API токен (None = общий клиент по DROPBOX_* из окружения)
         """
         self.token = token
         self.dbx = None
@@ -40,14 +345,17 @@ class DropboxSync:
         """Подключение к Dropbox"""
         logger.info("Подключение к Dropbox...")
         try:
-            self.dbx = dropbox.Dropbox(self.token)
+            if self.token:
+                self.dbx = dropbox.Dropbox(self.token, session=shared_session())
+            else:
+                self.dbx = create_dropbox_client()
             # Проверка подключения
             account = self.dbx.users_get_current_account()
             logger.info(f"✅ Подключен к Dropbox")
             logger.info(f"   Аккаунт: {account.name.display_name}")
             logger.info(f"   Email: {account.email}")
             return True
-        except AuthError as e:
+        except (AuthError, DropboxTokenError) as e:
             logger.error(f"❌ Ошибка авторизации Dropbox: {e}")
             return False
         except Exception as e:
@@ -204,6 +512,15 @@ class DropboxSync:
             logger.error(f"❌ Ошибка загрузки файла: {e}")
             return False
     
+    def upload_files(self, files: List[Tuple[str, str]],
+                     manifest_path: Optional[str] = None) -> Dict[str, List[str]]:
+        """Пакетная загрузка: пары (локальный путь, путь в Dropbox), см. upload_batch"""
+        return upload_batch(self.dbx, files, manifest_path)
+    
+    def download_files(self, files: List[Tuple[str, str]]) -> Dict[str, bool]:
+        """Параллельное скачивание: пары (путь в Dropbox, локальный путь)"""
+        return download_batch(self.dbx, files)
+    
     def get_file_info(self, dropbox_path: str) -> dict:
         """
         Получить информацию о файле
@@ -234,7 +551,7 @@ class DropboxSync:
 
 
 def sync_with_dropbox(
-    token: str,
+    token: Optional[str],
     local_file: str,
     dropbox_file: str = None,
     filename: str = None,
@@ -245,7 +562,7 @@ def sync_with_dropbox(
     Полная синхронизация с Dropbox
     
     Args:
-        token: Dropbox токен
+        token: Dropbox токен (None = DROPBOX_* из окружения)
         local_file: Локальный путь к файлу
         dropbox_file: Путь к файлу в Dropbox (или None для автопоиска)
         filename: Имя файла для поиска (если dropbox_file не указан)
@@ -307,15 +624,27 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Синхронизация с Dropbox')
-    parser.add_argument('--token', required=True, help='Dropbox API токен')
+    parser.add_argument('--token', help='Dropbox API токен (по умолчанию DROPBOX_* из окружения)')
     parser.add_argument('--local', required=True, help='Локальный путь к файлу')
     parser.add_argument('--dropbox', help='Путь к файлу в Dropbox')
     parser.add_argument('--filename', help='Имя файла для автопоиска')
     parser.add_argument('--download-only', action='store_true', help='Только скачать')
     parser.add_argument('--upload-only', action='store_true', help='Только загрузить')
+    parser.add_argument('--upload-dir', action='store_true',
+                        help='--local - папка: загрузить все её файлы пакетом в папку --dropbox')
     
     args = parser.parse_args()
     
+    if args.upload_dir:
+        sync = DropboxSync(args.token)
+        if not sync.connect() or not args.dropbox:
+            sys.exit(1)
+        files = [(os.path.join(args.local, name), f"{args.dropbox.rstrip('/')}/{name}")
+                 for name in sorted(os.listdir(args.local))
+                 if not name.startswith('.') and os.path.isfile(os.path.join(args.local, name))]
+        report = sync.upload_files(files, os.path.join(args.local, '.dropbox_manifest.json'))
+        sys.exit(1 if report['failed'] else 0)
+    
     success = sync_with_dropbox(
         token=args.token,
         local_file=args.local,
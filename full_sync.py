@@ -4,44 +4,38 @@ full_sync.py - Полная синхронизация Trello ↔ Excel ↔ Drop
 С АВТОСОРТИРОВКОЙ по дате начала работ
 """
 import os
-import subprocess
+import sys
+import time
 import shutil
 import dropbox
-import requests
 import openpyxl
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+from pipeline import Pipeline
+
 load_dotenv()
 
+# Акты: локальная папка, папка в Dropbox, шаблон
+ACTS_DIR = os.getenv('ACTS_DIR', 'acts')
+ACTS_DROPBOX_PATH = os.getenv('ACTS_DROPBOX_PATH', '/acts')
+
 def get_dropbox_client():
-    """Получает access токен из refresh токена"""
-    print("🔄 Dropbox: refresh токен → access токен...")
-    
-    app_key = os.getenv('DROPBOX_APP_KEY')
-    app_secret = os.getenv('DROPBOX_APP_SECRET')
-    refresh_token = os.getenv('DROPBOX_REFRESH_TOKEN')
+    """Клиент Dropbox: access токен из кэша или по refresh токену"""
+    print("🔄 Dropbox: access токен (кэш или refresh токен)...")
     
-    if not all([app_key, app_secret, refresh_token]):
-        print("❌ DROPBOX_* переменные не найдены в .env")
-        exit(1)
-    
-    response = requests.post('https://api.dropbox.com/oauth2/token', data={
-        'grant_type': 'refresh_token',
-        'refresh_token': refresh_token,
-        'client_id': app_key,
-        'client_secret': app_secret,
-    })
+    # Импорт здесь: logging.basicConfig из sync_trello_severen (лог в файл) должен быть первым
+    from dropbox_sync import create_dropbox_client, DropboxTokenError
     
-    if response.status_code != 200:
-        print(f"❌ Dropbox API: {response.status_code}")
-        print(response.text)
+    try:
+        dbx = create_dropbox_client()
+    except DropboxTokenError as e:
+        print(f"❌ {e}")
         exit(1)
     
-    data = response.json()
     print(f"✅ Access токен получен")
-    return dropbox.Dropbox(data['access_token'])
+    return dbx
 
 def sort_excel_by_date(excel_file: str):
     """
@@ -60,7 +54,7 @@ def sort_excel_by_date(excel_file: str):
         
         if ws.max_row < 3:
             print("  ℹ️  Нечего сортировать (мало строк)")
-            return
+            return wb
         
         print(f"  📋 Сортировка {ws.max_row - 1} строк данных...")
         
@@ -146,33 +140,29 @@ def sort_excel_by_date(excel_file: str):
                 address_short = "Нет адреса"
             print(f"     Строка {row}: {date_val} - {address_short}")
         
+        return wb
+        
     except Exception as e:
         print(f"  ⚠️ Ошибка сортировки: {e}")
         print(f"  Файл сохранён без сортировки")
+        return None
 
-def full_sync():
-    print("="*80)
-    print(f"🚀 ПОЛНАЯ СИНХРОНИЗАЦИЯ TRELLO → EXCEL → DROPBOX + СОРТИРОВКА")
-    print(f"⏰ Начало: {datetime.now()}")
-    print("="*80)
-    
-    # Подключение к Dropbox
-    dbx = get_dropbox_client()
-    
-    # Пути к файлам
-    dropbox_path = "/data.xlsx"  # ✅ Файл в КОРНЕ Dropbox (40 KB)
-    base_excel = "data.xlsx"      # Локальная копия в корне проекта
-    tmp_excel = "/tmp/data.xlsx"  # Временный файл для обработки
-    
-    # Путь к sync_trello_severen.py
-    sync_script = "severen-generator/sync_trello_severen.py"
-    if not os.path.exists(sync_script):
-        sync_script = "sync_trello_severen.py"
-        if not os.path.exists(sync_script):
-            print(f"❌ sync_trello_severen.py не найден!")
-            exit(1)
+
+def fetch_trello(sync_trello):
+    """
+    Загрузка данных доски Trello (этап конвейера, от data.xlsx не зависит)
     
-    # === ШАГ 1: Скачиваем актуальный файл из Dropbox ===
+    Returns:
+        Данные досок (fetch_boards) или None, если TRELLO_* не заданы
+    """
+    parsers = sync_trello.create_parsers()
+    if not parsers:
+        return None
+    return sync_trello.fetch_boards(parsers)
+
+
+def download_data(dropbox_path: str, base_excel: str, tmp_excel: str, dbx):
+    """Шаги 1-2: скачивание data.xlsx из Dropbox и копия в /tmp для обработки"""
     print("\n📥 ШАГ 1/5: Скачивание data.xlsx из Dropbox (корень)")
     print("-" * 80)
     
@@ -201,8 +191,10 @@ def full_sync():
     stat = os.stat(tmp_excel)
     print(f"  ✅ Скопирован: {base_excel} → {tmp_excel}")
     print(f"     📊 Размер: {stat.st_size / 1024:.2f} KB")
-    
-    # === ШАГ 3: Trello синхронизация ===
+
+
+def merge_trello(sync_trello, sync_script: str, tmp_excel: str, downloaded, trello_data):
+    """Шаг 3: слияние уже загруженной доски Trello с Excel"""
     print("\n🔄 ШАГ 3/5: Синхронизация с Trello")
     print("-" * 80)
     print(f"  📝 Используется скрипт: {sync_script}")
@@ -210,38 +202,33 @@ def full_sync():
     stat_before = os.stat(tmp_excel)
     print(f"  📄 ДО sync_trello: {stat_before.st_size / 1024:.2f} KB")
     
-    try:
-        result = subprocess.run(
-            ['python3', sync_script, '--file', tmp_excel],
-            check=True, capture_output=True, text=True
-        )
-        
-        # Показываем вывод скрипта
-        if result.stdout.strip():
-            for line in result.stdout.strip().split('\n'):
-                print(f"    {line}")
-        
-        stat_after = os.stat(tmp_excel)
-        print(f"  📄 ПОСЛЕ sync_trello: {stat_after.st_size / 1024:.2f} KB")
-        
-        size_diff = stat_after.st_size - stat_before.st_size
-        if size_diff != 0:
-            print(f"  ✅ Файл изменён! Δ = {size_diff / 1024:+.2f} KB")
-        else:
-            print(f"  ℹ️  Размер не изменился (нет новых данных из Trello)")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"  ❌ Ошибка sync_trello_severen.py:")
-        if e.stdout:
-            print(e.stdout)
-        if e.stderr:
-            print(e.stderr)
+    if not sync_trello.sync_trello_to_excel(tmp_excel, os.getenv('WORKS_DB'), trello_data):
+        print(f"  ❌ Ошибка sync_trello_severen.py (подробности в /tmp/trello_sync.log)")
         exit(1)
     
-    # === ШАГ 4: Сортировка по дате ===
-    sort_excel_by_date(tmp_excel)
+    stat_after = os.stat(tmp_excel)
+    print(f"  📄 ПОСЛЕ sync_trello: {stat_after.st_size / 1024:.2f} KB")
     
-    # === ШАГ 5: Загрузка обратно в Dropbox ===
+    size_diff = stat_after.st_size - stat_before.st_size
+    if size_diff != 0:
+        print(f"  ✅ Файл изменён! Δ = {size_diff / 1024:+.2f} KB")
+    else:
+        print(f"  ℹ️  Размер не изменился (нет новых данных из Trello)")
+
+
+def sort_data(tmp_excel: str, merged):
+    """Шаг 4: сортировка по дате; возвращает книгу в памяти (или None)"""
+    if os.getenv('WORKS_DB'):
+        # С хранилищем Excel перерисован уже в порядке дат (ORDER BY start_date)
+        print("\n📊 ШАГ 5/5: Сортировка строк по дате")
+        print("-" * 80)
+        print(f"  ✅ Строки упорядочены хранилищем {os.getenv('WORKS_DB')}")
+        return None
+    return sort_excel_by_date(tmp_excel)
+
+
+def upload_data(dropbox_path: str, base_excel: str, tmp_excel: str, dbx, wb):
+    """Шаг 5: загрузка обновлённого data.xlsx в Dropbox"""
     print("\n📤 ШАГ 6/6: Загрузка обновлённого файла в Dropbox")
     print("-" * 80)
     
@@ -262,6 +249,141 @@ def full_sync():
     # Обновляем локальную копию
     shutil.copy(tmp_excel, base_excel)
     print(f"  ✅ Обновлён локально: {base_excel}")
+
+
+def find_act_template():
+    """template.xlsx: ACT_TEMPLATE, рядом со скриптом (Docker) или в windows/"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    candidates = [
+        os.getenv('ACT_TEMPLATE'),
+        os.path.join(base_dir, 'template.xlsx'),
+        os.path.join(base_dir, 'windows', 'template.xlsx'),
+    ]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def generate_acts(excel_file: str, wb):
+    """
+    Генерация актов из книги в памяти
+    
+    Перегенерируются только акты, строки которых изменились с прошлого
+    запуска (отпечатки - в манифесте ACTS_DIR/.acts_manifest.json).
+    
+    Args:
+        excel_file: Обновлённый data.xlsx
+        wb: Книга после синхронизации и сортировки (None - прочитать excel_file)
+        
+    Returns:
+        {'results', 'manifest', 'manifest_path'} или None, если акты не сгенерированы
+    """
+    print("\n🧾 ШАГ 7/7: Генерация актов")
+    print("-" * 80)
+    
+    try:
+        windows_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'windows')
+        if os.path.isdir(windows_dir) and windows_dir not in sys.path:
+            sys.path.insert(0, windows_dir)
+        import generate_act
+        
+        template_path = find_act_template()
+        if not template_path:
+            print("  ⚠️ template.xlsx не найден - акты не генерируются")
+            return None
+        
+        if wb is None:
+            # Своя книга закрывается сразу: read_only держит файл открытым,
+            # а на Windows это блокирует data.xlsx для загрузки
+            own_wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+            try:
+                df_data, df_rates = generate_act.frames_from_workbook(own_wb)
+            finally:
+                own_wb.close()
+        else:
+            # Книга сортировки - с формулами; стоимость по формуле берётся из расценок
+            df_data, df_rates = generate_act.frames_from_workbook(wb)
+        
+        os.makedirs(ACTS_DIR, exist_ok=True)
+        manifest_path = os.path.join(ACTS_DIR, generate_act.ACTS_MANIFEST)
+        
+        results, manifest = generate_act.render_changed_acts(
+            df_data, df_rates, template_path, ACTS_DIR,
+            generate_act.load_manifest(manifest_path)
+        )
+        return {'results': results, 'manifest': manifest, 'manifest_path': manifest_path}
+        
+    except Exception as e:
+        print(f"  ⚠️ Ошибка генерации актов: {e}")
+        print(f"  data.xlsx синхронизирован, акты будут обновлены при следующем запуске")
+        return None
+
+
+def upload_acts(dbx, acts):
+    """Загрузка изменённых актов в Dropbox одним пакетом (upload sessions + finish_batch)"""
+    if not acts or not acts['results']:
+        return
+    import generate_act
+    from dropbox_sync import upload_batch
+    
+    files = [(result['file'], f"{ACTS_DROPBOX_PATH}/{os.path.basename(result['file'])}")
+             for result in acts['results']]
+    try:
+        report = upload_batch(dbx, files, os.path.join(ACTS_DIR, '.dropbox_manifest.json'))
+        for remote_path in report['uploaded']:
+            print(f"  ✅ Загружен в Dropbox: {remote_path}")
+        if report['failed']:
+            raise RuntimeError(f"не загружены: {', '.join(report['failed'])}")
+        # Манифест актов сохраняется только после успешной загрузки
+        generate_act.save_manifest(acts['manifest_path'], acts['manifest'])
+    except Exception as e:
+        print(f"  ⚠️ Ошибка загрузки актов: {e}")
+        print(f"  data.xlsx синхронизирован, акты будут обновлены при следующем запуске")
+
+
+def full_sync():
+    print("="*80)
+    print(f"🚀 ПОЛНАЯ СИНХРОНИЗАЦИЯ TRELLO → EXCEL → DROPBOX + СОРТИРОВКА")
+    print(f"⏰ Начало: {datetime.now()}")
+    print("="*80)
+    
+    # Пути к файлам
+    dropbox_path = os.getenv('DROPBOX_DATA_PATH', "/data.xlsx")  # ✅ Файл в КОРНЕ Dropbox (40 KB)
+    base_excel = "data.xlsx"      # Локальная копия в корне проекта
+    tmp_excel = "/tmp/data.xlsx"  # Временный файл для обработки
+    
+    # Путь к sync_trello_severen.py
+    sync_script = "severen-generator/sync_trello_severen.py"
+    if not os.path.exists(sync_script):
+        sync_script = "sync_trello_severen.py"
+        if not os.path.exists(sync_script):
+            print(f"❌ sync_trello_severen.py не найден!")
+            exit(1)
+    
+    sys.path.insert(0, os.path.dirname(os.path.abspath(sync_script)))
+    import sync_trello_severen as sync_trello
+    
+    # Этапы и зависимости: токен Dropbox и доска Trello грузятся одновременно,
+    # слияние ждёт и файл, и доску; акты рендерятся параллельно с загрузкой data.xlsx
+    pipeline = Pipeline(max_concurrency=int(os.getenv('SYNC_CONCURRENCY', '4')))
+    pipeline.add('dbx', get_dropbox_client)
+    pipeline.add('trello_data', fetch_trello, sync_trello)
+    pipeline.add('downloaded', download_data, dropbox_path, base_excel, tmp_excel, after=['dbx'])
+    pipeline.add('merged', merge_trello, sync_trello, sync_script, tmp_excel,
+                 after=['downloaded', 'trello_data'])
+    pipeline.add('wb', sort_data, tmp_excel, after=['merged'])
+    pipeline.add('uploaded', upload_data, dropbox_path, base_excel, tmp_excel, after=['dbx', 'wb'])
+    pipeline.add('acts', generate_acts, tmp_excel, after=['wb'])
+    pipeline.add('acts_uploaded', upload_acts, after=['dbx', 'acts'])
+    
+    started = time.perf_counter()
+    pipeline.run()
+    
+    print("\n⏱️ Этапы:")
+    for line in pipeline.report():
+        print(f"  {line}")
+    print(f"  {'всего':<16} {time.perf_counter() - started:6.2f} с")
     
     print("\n" + "="*80)
     print(f"✅ УСПЕХ! Синхронизация и сортировка завершены")
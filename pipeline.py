@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+pipeline.py - Асинхронный движок этапов синхронизации
+
+Этапы (токен Dropbox, скачивание, загрузка доски Trello, слияние,
+загрузки в Dropbox) объявляются с зависимостями. Этапы, которые друг
+от друга не зависят, выполняются одновременно; блокирующие вызовы
+(requests, Dropbox SDK) уходят в общий пул потоков с ограничением
+параллельности.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Ошибка этапа конвейера"""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"этап '{stage}': {error}")
+        self.stage = stage
+        self.error = error
+
+
+class _Interrupt(Exception):
+    """
+    SystemExit/KeyboardInterrupt этапа на пути через цикл событий
+
+    Из задачи asyncio они вылетают мимо gather и отмены остальных этапов,
+    поэтому до run() их несёт обычное исключение, а run() поднимает
+    исходное как есть.
+    """
+
+    def __init__(self, error: BaseException):
+        super().__init__(error)
+        self.error = error
+
+
+class Stage:
+    """Этап: функция, её постоянные аргументы и зависимости"""
+
+    def __init__(self, name: str, func: Callable, args: tuple, after: List[str]):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.after = after
+
+
+class Pipeline:
+    """
+    Конвейер этапов на asyncio
+
+    Функция этапа получает свои аргументы из add() и результаты
+    зависимостей - именованными аргументами с именами этапов и
+    выполняется в пуле потоков. Исключение этапа оборачивается в
+    PipelineError; SystemExit (exit() внутри этапа) и KeyboardInterrupt
+    пробрасываются как есть.
+
+    Пример:
+        pipeline = Pipeline(max_concurrency=4)
+        pipeline.add('dbx', get_dropbox_client)
+        pipeline.add('cards', fetch_cards, board_id)
+        pipeline.add('merged', merge, path, after=['dbx', 'cards'])  # merge(path, dbx=..., cards=...)
+        results = pipeline.run()
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max(1, max_concurrency)
+        self.stages: Dict[str, Stage] = {}
+        self.timings: Dict[str, float] = {}
+        self._semaphore = None
+        self._executor = None
+
+    def add(self, name: str, func: Callable, *args, after: Iterable[str] = ()) -> str:
+        """
+        Объявление этапа
+
+        Зависимости должны быть объявлены раньше - так циклы невозможны.
+        """
+        if name in self.stages:
+            raise ValueError(f"Этап '{name}' уже объявлен")
+        after = list(after)
+        for dep in after:
+            if dep not in self.stages:
+                raise ValueError(f"Этап '{name}': неизвестная зависимость '{dep}'")
+        self.stages[name] = Stage(name, func, args, after)
+        return name
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        """Блокирующий вызов в пуле потоков (не больше max_concurrency одновременно)"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Future]):
+        deps = {}
+        for dep in stage.after:
+            deps[dep] = await tasks[dep]
+
+        started = time.perf_counter()
+        try:
+            result = await self._call(stage.func, *stage.args, **deps)
+        except Exception as e:
+            raise PipelineError(stage.name, e) from e
+        except (SystemExit, KeyboardInterrupt) as e:
+            raise _Interrupt(e) from None
+        finally:
+            self.timings[stage.name] = time.perf_counter() - started
+        return result
+
+    async def run_async(self) -> dict:
+        """Запуск всех этапов; при ошибке этапа незапущенные этапы отменяются"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix='pipeline')
+        tasks = {}
+        try:
+            for name, stage in self.stages.items():
+                tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks))
+            values = await asyncio.gather(*tasks.values())
+            return dict(zip(tasks, values))
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def run(self) -> dict:
+        """Синхронная обёртка: результаты этапов по именам"""
+        try:
+            return asyncio.run(self.run_async())
+        except _Interrupt as e:
+            raise e.error
+
+    def report(self) -> List[str]:
+        """Время этапов в порядке объявления"""
+        return [f"{name:<16} {self.timings[name]:6.2f} с"
+                for name in self.stages if name in self.timings]
@@ -7,7 +7,11 @@
 import os
 import sys
 import re
+import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -33,51 +37,257 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Кэш меток/списков досок: определения меняются редко
+TRELLO_META_TTL = int(os.getenv('TRELLO_META_TTL', '86400'))
+META_CACHE_VERSION = 2  # записи других версий перечитываются из Trello
+_meta_cache_lock = threading.Lock()
+
+
+def meta_cache_path() -> str:
+    """Файл кэша меток и списков (TRELLO_META_CACHE или ~/.cache/severen/)"""
+    return os.getenv('TRELLO_META_CACHE') or \
+        os.path.expanduser('~/.cache/severen/trello_meta.json')
+
+
+def _read_meta_cache() -> Dict:
+    try:
+        with open(meta_cache_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_board_meta(board_id: str, max_age: Optional[float] = TRELLO_META_TTL) -> Optional[Dict]:
+    """
+    Метаданные доски из кэша
+    
+    Args:
+        board_id: ID доски
+        max_age: Допустимый возраст записи в секундах (None - любой)
+    """
+    with _meta_cache_lock:
+        entry = _read_meta_cache().get(board_id)
+    if not entry or entry.get('version') != META_CACHE_VERSION:
+        return None
+    if max_age is not None and time.time() - entry.get('fetched_at', 0) > max_age:
+        return None
+    return entry
+
+
+def store_board_meta(board_id: str, meta: Dict):
+    """Сохранение метаданных доски в кэш (через временный файл)"""
+    path = meta_cache_path()
+    with _meta_cache_lock:
+        cache = _read_meta_cache()
+        cache[board_id] = dict(meta, fetched_at=time.time(), version=META_CACHE_VERSION)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning(f"⚠️ Кэш меток/списков не сохранён: {e}")
+
+
+# История перемещений карточек: курсор (последнее действие) и последнее
+# перемещение каждой карточки - чтобы каждый запуск читал только новые действия
+TRELLO_DONE_LIST = os.getenv('TRELLO_DONE_LIST', 'Выполнен')
+ACTIONS_PAGE_LIMIT = 1000  # максимум Trello для /boards/{id}/actions
+_actions_cache_lock = threading.Lock()
+
+
+def actions_cache_path() -> str:
+    """Файл курсора действий (TRELLO_ACTIONS_CACHE или ~/.cache/severen/)"""
+    return os.getenv('TRELLO_ACTIONS_CACHE') or \
+        os.path.expanduser('~/.cache/severen/trello_actions.json')
+
+
+def _read_actions_cache() -> Dict:
+    try:
+        with open(actions_cache_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_card_moves(board_id: str) -> Dict:
+    """Курсор и перемещения карточек доски из кэша: {'cursor', 'moves'}"""
+    with _actions_cache_lock:
+        return _read_actions_cache().get(board_id) or {}
+
+
+def store_card_moves(board_id: str, entry: Dict):
+    """Сохранение курсора и перемещений доски (через временный файл)"""
+    path = actions_cache_path()
+    with _actions_cache_lock:
+        cache = _read_actions_cache()
+        cache[board_id] = entry
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning(f"⚠️ Курсор действий не сохранён: {e}")
+
+
+# Пользовательские поля Trello → поля карточки (как в описании), по имени поля
+CUSTOM_FIELD_KEYS = {
+    'начало работ': 'Начало работ',
+    'дата начала': 'Начало работ',
+    'подрядчик': 'Подрядчик',
+    'заказчик': 'Заказчик',
+    'исполнитель': 'Исполнитель',
+    'ответственный': 'Ответственный',
+}
+
+# Регулярные выражения для полей в описании (запасной путь без пользовательских полей)
+DESCRIPTION_PATTERNS = {
+    'Начало работ': re.compile(r'Начало работ[:\s]+([^\n]+)', re.IGNORECASE),
+    'Подрядчик': re.compile(r'Подрядчик[:\s]+([^\n]+)', re.IGNORECASE),
+    'Заказчик': re.compile(r'Заказчик[:\s]+([^\n]+)', re.IGNORECASE),
+    'Исполнитель': re.compile(r'Исполнитель[:\s]+([^\n]+)', re.IGNORECASE),
+    'Ответственный': re.compile(r'Ответственный[:\s]+([^\n]+)', re.IGNORECASE),
+}
+
+
+def custom_field_map(definitions: List[Dict]) -> Dict:
+    """
+    Карта id пользовательского поля → поле карточки
+    
+    Args:
+        definitions: Определения полей доски (customFields из /boards/{id})
+    
+    Returns:
+        {field_id: {'key': поле карточки, 'type': тип Trello,
+                    'options': {option_id: текст} для выпадающих списков}}
+    """
+    field_map = {}
+    for definition in definitions:
+        key = CUSTOM_FIELD_KEYS.get(definition.get('name', '').strip().rstrip(':').lower())
+        if not key:
+            continue
+        field_map[definition['id']] = {
+            'key': key,
+            'type': definition.get('type', 'text'),
+            'options': {option['id']: (option.get('value') or {}).get('text', '')
+                        for option in definition.get('options') or []},
+        }
+    return field_map
+
+
+def _local_date(value: str) -> Optional[datetime]:
+    """ISO время Trello (UTC) → локальная дата без времени"""
+    try:
+        moment = date_parser.isoparse(value).astimezone()
+    except (ValueError, TypeError):
+        return None
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def custom_field_value(item: Dict, spec: Dict):
+    """
+    Типизированное значение из customFieldItems
+    
+    Дата → datetime, выпадающий список → текст варианта, число → float,
+    флажок → bool, текст → строка. Пустое значение → None.
+    """
+    field_type = spec['type']
+    if field_type == 'list':
+        return spec['options'].get(item.get('idValue')) or None
+    value = item.get('value') or {}
+    if field_type == 'date':
+        return _local_date(value.get('date'))
+    if field_type == 'number':
+        try:
+            return float(value['number'])
+        except (KeyError, TypeError, ValueError):
+            return None
+    if field_type == 'checkbox':
+        return value.get('checked') == 'true'
+    text = (value.get('text') or '').strip()
+    return text or None
+
+
+def completion_date(card: Dict, lists_map: Dict, moves: Optional[Dict]) -> Optional[datetime]:
+    """
+    Дата, когда карточка попала в список "Выполнен" (TRELLO_DONE_LIST)
+    
+    Берётся последнее перемещение карточки, если она и сейчас в том же
+    списке. Список сравнивается по id или по имени целиком (без пробелов
+    по краям, без учёта регистра) - "Не выполнено" не считается "Выполнен".
+    Карточка, созданная сразу в этом списке, перемещений не имеет -
+    тогда None (дата ставится вручную).
+    
+    Returns:
+        Дата (локальная, без времени) или None
+    """
+    move = (moves or {}).get(card.get('id'))
+    list_id = card.get('idList')
+    if not move or move['list'] != list_id:
+        return None
+    done = TRELLO_DONE_LIST.strip().casefold()
+    if list_id.casefold() != done and lists_map.get(list_id, '').strip().casefold() != done:
+        return None
+    return _local_date(move['date'])
+
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """HTTP сессия с пулом соединений для запросов к Trello"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    return session
+
+
 class TrelloParser:
     """Парсер Trello карточек"""
     
-    def __init__(self, api_key: str, token: str, board_id: str):
+    def __init__(self, api_key: str, token: str, board_id: str,
+                 session: Optional[requests.Session] = None):
         self.api_key = api_key
         self.token = token
         self.board_id = board_id
         self.base_url = "https://api.trello.com/1"
         
+        # Сессия с пулом соединений к api.trello.com: общая для всех досок
+        # (create_parsers) и для параллельных запросов из fetch_trello_data
+        self.session = session or create_session()
+        
+        # Счётчик запросов к API (метрика запуска)
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+    
+    def _get(self, path: str, **params):
+        """GET к Trello API с ключом/токеном; считает запросы"""
+        with self._count_lock:
+            self.request_count += 1
+        params.update(key=self.api_key, token=self.token)
+        response = self.session.get(f"{self.base_url}{path}", params=params)
+        response.raise_for_status()
+        return response.json()
+        
     def get_cards(self, include_archived: bool = True) -> List[Dict]:
         """
-        Получение всех карточек с доски
+        Получение всех карточек с доски (один запрос: filter=all)
         
         Args:
             include_archived: Включать ли архивные карточки
         """
         logger.info("Загрузка карточек из Trello...")
         
-        # Получаем активные карточки
-        url = f"{self.base_url}/boards/{self.board_id}/cards"
-        params = {
-            'key': self.api_key,
-            'token': self.token,
-            'fields': 'all',
-            'customFieldItems': 'true'
-        }
-        
-        all_cards = []
-        
         try:
-            # Активные карточки
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            active_cards = response.json()
-            all_cards.extend(active_cards)
-            logger.info(f"✅ Загружено активных карточек: {len(active_cards)}")
+            all_cards = self._get(
+                f"/boards/{self.board_id}/cards",
+                fields='all',
+                customFieldItems='true',
+                filter='all' if include_archived else 'open',
+            )
             
-            # Архивные карточки (если нужно)
+            archived = sum(1 for card in all_cards if card.get('closed'))
+            logger.info(f"✅ Загружено активных карточек: {len(all_cards) - archived}")
             if include_archived:
-                params['filter'] = 'closed'
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                archived_cards = response.json()
-                all_cards.extend(archived_cards)
-                logger.info(f"✅ Загружено архивных карточек: {len(archived_cards)}")
+                logger.info(f"✅ Загружено архивных карточек: {archived}")
             
             logger.info(f"✅ Всего карточек: {len(all_cards)}")
             return all_cards
@@ -86,15 +296,110 @@ class TrelloParser:
             logger.error(f"❌ Ошибка загрузки карточек: {e}")
             return []
     
+    def get_board_meta(self, use_cache: bool = True) -> Dict:
+        """
+        Метки, списки, определения пользовательских полей и данные доски -
+        одним вложенным запросом /boards/{id}?labels=all&lists=all&customFields=true
+        
+        Args:
+            use_cache: Взять из кэша, если запись моложе TRELLO_META_TTL
+        
+        Returns:
+            {'name': имя доски, 'labels': {id: имя}, 'lists': {id: имя},
+             'custom_fields': {id: имя}, 'field_map': custom_field_map(...)}
+        """
+        if use_cache:
+            cached = load_board_meta(self.board_id)
+            if cached:
+                logger.info(f"⚡ Метки и списки доски {self.board_id} из кэша")
+                return cached
+        
+        try:
+            board = self._get(
+                f"/boards/{self.board_id}",
+                fields='name',
+                labels='all', label_fields='name', labels_limit=1000,
+                lists='all', list_fields='name',
+                customFields='true',
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки меток/списков доски: {e}")
+            # Устаревший кэш лучше пустых меток и статусов
+            stale = load_board_meta(self.board_id, max_age=None)
+            if stale:
+                logger.warning("⚠️ Используются метки и списки из устаревшего кэша")
+                return stale
+            return {'name': '', 'labels': {}, 'lists': {}, 'custom_fields': {}, 'field_map': {}}
+        
+        meta = {
+            'name': board.get('name', ''),
+            'labels': {label['id']: label['name'] for label in board.get('labels', [])},
+            'lists': {lst['id']: lst['name'] for lst in board.get('lists', [])},
+            'custom_fields': {field['id']: field['name'] for field in board.get('customFields', [])},
+            'field_map': custom_field_map(board.get('customFields', [])),
+        }
+        store_board_meta(self.board_id, meta)
+        return meta
+    
+    def get_card_moves(self) -> Dict:
+        """
+        Перемещения карточек между списками (действия updateCard:idList)
+        
+        Действия доски читаются страницами по 1000 (before = самое старое
+        на странице) начиная с курсора прошлого запуска, так что обычно
+        это один короткий запрос. Курсор сдвигается только после успешного
+        чтения всех страниц.
+        
+        Returns:
+            {card_id: {'list': id списка, 'date': ISO время}} - последнее
+            перемещение каждой карточки
+        """
+        cached = load_card_moves(self.board_id)
+        moves = dict(cached.get('moves', {}))
+        cursor = cached.get('cursor')
+        
+        params = {'filter': 'updateCard:idList', 'fields': 'date,data',
+                  'memberCreator': 'false', 'limit': ACTIONS_PAGE_LIMIT}
+        if cursor:
+            params['since'] = cursor
+        
+        actions = []
+        try:
+            while True:
+                page = self._get(f"/boards/{self.board_id}/actions", **params)
+                actions.extend(page)
+                if len(page) < ACTIONS_PAGE_LIMIT:
+                    break
+                params['before'] = page[-1]['id']
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки истории перемещений: {e}")
+            return moves
+        
+        # Страницы идут от новых к старым; применяем по порядку времени
+        for action in sorted(actions, key=lambda a: a.get('date', '')):
+            data = action.get('data', {})
+            card_id = (data.get('card') or {}).get('id')
+            list_id = (data.get('listAfter') or {}).get('id')
+            if card_id and list_id:
+                moves[card_id] = {'list': list_id, 'date': action['date']}
+        
+        if actions:
+            cursor = max(actions, key=lambda a: a.get('date', ''))['id']
+            logger.info(f"✅ Перемещений карточек с прошлого запуска: {len(actions)}")
+        store_card_moves(self.board_id, {'cursor': cursor, 'moves': moves})
+        return moves
+    
+    @staticmethod
+    def has_unknown_ids(card: Dict, labels_map: Dict, lists_map: Dict) -> bool:
+        """Есть ли у карточки метки или список, которых нет в картах доски"""
+        if card.get('idList') and card['idList'] not in lists_map:
+            return True
+        return any(lid not in labels_map for lid in card.get('idLabels', []))
+    
     def get_labels(self) -> Dict:
         """Получение меток доски"""
-        url = f"{self.base_url}/boards/{self.board_id}/labels"
-        params = {'key': self.api_key, 'token': self.token}
-        
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            labels_list = response.json()
+            labels_list = self._get(f"/boards/{self.board_id}/labels")
             
             # Создаём словарь: label_id -> label_name
             labels = {label['id']: label['name'] for label in labels_list}
@@ -105,13 +410,8 @@ class TrelloParser:
     
     def get_lists(self) -> Dict:
         """Получение списков (колонок) доски"""
-        url = f"{self.base_url}/boards/{self.board_id}/lists"
-        params = {'key': self.api_key, 'token': self.token}
-        
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            lists_data = response.json()
+            lists_data = self._get(f"/boards/{self.board_id}/lists")
             
             # Создаём словарь: list_id -> list_name
             lists = {lst['id']: lst['name'] for lst in lists_data}
@@ -120,12 +420,18 @@ class TrelloParser:
             logger.error(f"❌ Ошибка загрузки списков: {e}")
             return {}
     
-    def parse_card(self, card: Dict, labels_map: Dict, lists_map: Dict) -> Dict:
+    def parse_card(self, card: Dict, labels_map: Dict, lists_map: Dict,
+                   moves: Optional[Dict] = None, field_map: Optional[Dict] = None) -> Dict:
         """
         Парсинг одной карточки
         
+        Args:
+            moves: Перемещения карточек (get_card_moves) - для даты окончания
+            field_map: Карта пользовательских полей доски (custom_field_map)
+        
         Returns:
-            Словарь с данными карточки
+            Словарь с данными карточки; 'fields_source' - откуда взяты поля:
+            'custom_fields', 'mixed' (часть из описания) или 'regex'
         """
         # Название карточки
         name = card.get('name', '')
@@ -139,12 +445,15 @@ class TrelloParser:
         # Описание
         description = card.get('desc', '')
         
-        # Парсим структурированные поля из описания
-        fields = self._parse_description_fields(description)
+        # Структурированные поля: пользовательские поля, описание - запасной путь
+        fields, fields_source = self._card_fields(card, description, field_map)
         
         # Метки
         label_ids = card.get('idLabels', [])
         card_labels = [labels_map.get(lid, '') for lid in label_ids if lid in labels_map]
+        unknown = [lid for lid in label_ids if lid not in labels_map]
+        if unknown:
+            logger.warning(f"⚠️ Неизвестные метки {unknown} у карточки: {name[:50]}")
         
         # Определяем клиента из меток
         client = self._extract_client(card_labels)
@@ -164,6 +473,8 @@ class TrelloParser:
         # Даты
         start_date = fields.get('Начало работ', '')
         
+        end_date = completion_date(card, lists_map, moves)
+        
         # Исполнитель
         executor = fields.get('Подрядчик', fields.get('Исполнитель', ''))
         
@@ -172,11 +483,13 @@ class TrelloParser:
             'address': address,
             'transit_addresses': transit_addresses,
             'start_date': start_date,
+            'end_date': end_date,
             'work_type': work_type,
             'client': client,
             'executor': executor,
             'status': status,
             'is_archived': is_archived,
+            'fields_source': fields_source,
             'description': description,
             'raw_name': name
         }
@@ -225,21 +538,42 @@ class TrelloParser:
         
         return main_address, transit_addresses
     
+    def _card_fields(self, card: Dict, description: str, field_map: Optional[Dict]) -> tuple:
+        """
+        Поля карточки из customFieldItems, описание - только для недостающих
+        
+        Описание разбирается, если из пользовательских полей не получены
+        начало работ или подрядчик/исполнитель.
+        
+        Returns:
+            (поля, источник: 'custom_fields' | 'mixed' | 'regex')
+        """
+        fields = {}
+        for item in card.get('customFieldItems') or []:
+            spec = (field_map or {}).get(item.get('idCustomField'))
+            if not spec:
+                continue
+            value = custom_field_value(item, spec)
+            if value is not None and value != '':
+                fields[spec['key']] = value
+        
+        has_executor = 'Подрядчик' in fields or 'Исполнитель' in fields
+        if 'Начало работ' in fields and has_executor:
+            return fields, 'custom_fields'
+        
+        parsed = self._parse_description_fields(description)
+        if not fields:
+            return parsed, 'regex'
+        for field_name, value in parsed.items():
+            fields.setdefault(field_name, value)
+        return fields, 'mixed'
+    
     def _parse_description_fields(self, description: str) -> Dict:
         """Парсинг структурированных полей из описания"""
         fields = {}
         
-        # Шаблоны для извлечения полей
-        patterns = {
-            'Начало работ': r'Начало работ[:\s]+([^\n]+)',
-            'Подрядчик': r'Подрядчик[:\s]+([^\n]+)',
-            'Заказчик': r'Заказчик[:\s]+([^\n]+)',
-            'Исполнитель': r'Исполнитель[:\s]+([^\n]+)',
-            'Ответственный': r'Ответственный[:\s]+([^\n]+)'
-        }
-        
-        for field_name, pattern in patterns.items():
-            match = re.search(pattern, description, re.IGNORECASE)
+        for field_name, pattern in DESCRIPTION_PATTERNS.items():
+            match = pattern.search(description)
             if match:
                 fields[field_name] = match.group(1).strip()
         
@@ -315,8 +649,17 @@ class TrelloParser:
 class ExcelManager:
     """Управление Excel файлом"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, db_path: Optional[str] = None):
+        """
+        Args:
+            file_path: Путь к Excel файлу
+            db_path: Путь к SQLite хранилищу (works_store). Если задан,
+                     строки читаются и пишутся через хранилище, а Excel
+                     перерисовывается из него при сохранении.
+        """
         self.file_path = file_path
+        self.db_path = db_path
+        self.store = None
         self.wb = None
         self.ws = None
         
@@ -329,6 +672,15 @@ class ExcelManager:
             return False
         
         try:
+            if self.db_path:
+                from works_store import WorksStore
+                
+                self.store = WorksStore(self.db_path)
+                self.store.import_excel(self.file_path)
+                self.ws = self.store.sheet()
+                logger.info(f"✅ Хранилище: {self.db_path} ({self.store.count()} строк)")
+                return True
+            
             self.wb = openpyxl.load_workbook(self.file_path)
             
             # Ищем рабочий лист
@@ -357,6 +709,10 @@ class ExcelManager:
         if not work_number:
             return None
         
+        # Индексированный поиск в хранилище
+        if self.store:
+            return self.store.find_row(work_number)
+        
         # Ищем в колонке C (Адрес + Задание)
         for row_idx in range(2, self.ws.max_row + 1):
             cell_value = self.ws.cell(row_idx, 3).value  # Колонка C
@@ -418,16 +774,20 @@ class ExcelManager:
             address_full += f". Задание {data['work_number']}"
         self.ws.cell(row, 3).value = address_full
         
-        # D: Начало работ - ОБНОВЛЯЕМ если есть
-        if data['start_date']:
+        # D: Начало работ - ОБНОВЛЯЕМ если есть (из поля-даты Trello - уже datetime)
+        if isinstance(data['start_date'], datetime):
+            self.ws.cell(row, 4).value = data['start_date']
+        elif data['start_date']:
             try:
                 date_obj = date_parser.parse(data['start_date'], dayfirst=True)
                 self.ws.cell(row, 4).value = date_obj
             except:
                 self.ws.cell(row, 4).value = data['start_date']
         
-        # E: Конец работ - НЕ ТРОГАЕМ (заполняется вручную)
-        # self.ws.cell(row, 5).value = None
+        # E: Конец работ - из истории Trello (перемещение в "Выполнен"),
+        # только если пусто: дату, поставленную вручную, не трогаем
+        if data.get('end_date') and not self.ws.cell(row, 5).value:
+            self.ws.cell(row, 5).value = data['end_date']
         
         # F: Название работ (тип работы) - ВСЕГДА ОБНОВЛЯЕМ
         self.ws.cell(row, 6).value = data['work_type']
@@ -469,6 +829,12 @@ class ExcelManager:
     def save(self) -> bool:
         """Сохранение файла"""
         try:
+            if self.store:
+                # Excel перерисовывается из хранилища (уже отсортированным)
+                self.store.render_excel(self.file_path)
+                self.store.close()
+                return True
+            
             self.wb.save(self.file_path)
             logger.info(f"✅ Файл сохранён: {self.file_path}")
             return True
@@ -477,12 +843,87 @@ class ExcelManager:
             return False
 
 
-def sync_trello_to_excel(excel_file: str) -> bool:
+def board_ids_from_env() -> List[str]:
+    """Доски из TRELLO_BOARD_IDS (через запятую) или одна TRELLO_BOARD_ID"""
+    value = os.getenv('TRELLO_BOARD_IDS') or os.getenv('TRELLO_BOARD_ID') or ''
+    board_ids = []
+    for board_id in value.split(','):
+        board_id = board_id.strip()
+        if board_id and board_id not in board_ids:
+            board_ids.append(board_id)
+    return board_ids
+
+
+def create_parsers() -> List[TrelloParser]:
+    """Парсеры всех досок из окружения TRELLO_* (пустой список, если не заданы)"""
+    api_key = os.getenv('TRELLO_API_KEY')
+    token = os.getenv('TRELLO_TOKEN')
+    board_ids = board_ids_from_env()
+    
+    if not all([api_key, token, board_ids]):
+        logger.error("❌ Не заданы переменные окружения TRELLO_*")
+        return []
+    
+    session = create_session(pool_size=8 * len(board_ids))
+    return [TrelloParser(api_key, token, board_id, session) for board_id in board_ids]
+
+
+def fetch_trello_data(parser: TrelloParser) -> Dict:
+    """
+    Загрузка доски: карточки, метаданные (метки, списки, поля) и история
+    перемещений - параллельно
+    
+    Запросы на доску: карточки (активные + архивные), вложенный запрос
+    доски с метками, списками и пользовательскими полями (если кэш устарел)
+    и новые действия updateCard:idList с курсора прошлого запуска.
+    
+    Returns:
+        {'board_id', 'name', 'cards': [...], 'labels': {id: имя},
+         'lists': {id: имя}, 'custom_fields': {id: имя},
+         'moves': {card_id: перемещение}, 'requests': число запросов}
+    """
+    requests_before = parser.request_count
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        cards = pool.submit(parser.get_cards)
+        meta = pool.submit(parser.get_board_meta)
+        moves = pool.submit(parser.get_card_moves)
+        board = {'board_id': parser.board_id, 'cards': cards.result(), 'moves': moves.result()}
+        board.update(meta.result())
+    board['requests'] = parser.request_count - requests_before
+    return board
+
+
+def fetch_boards(parsers: List[TrelloParser]) -> List[Dict]:
+    """
+    Загрузка нескольких досок одновременно
+    
+    Не больше TRELLO_BOARD_CONCURRENCY досок за раз (по умолчанию 4);
+    метки и списки у каждой доски свои.
+    
+    Returns:
+        Список fetch_trello_data в порядке досок
+    """
+    if len(parsers) == 1:
+        return [fetch_trello_data(parsers[0])]
+    
+    workers = min(len(parsers), int(os.getenv('TRELLO_BOARD_CONCURRENCY', '4')))
+    logger.info(f"Загрузка {len(parsers)} досок Trello (одновременно: {workers})...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch_trello_data, parsers))
+
+
+def sync_trello_to_excel(excel_file: str, db_path: Optional[str] = None,
+                         trello_data: Optional[List[Dict]] = None) -> bool:
     """
     Главная функция синхронизации
     
+    Карточки всех досок (TRELLO_BOARD_IDS) сливаются в книгу за один
+    проход с одним сохранением.
+    
     Args:
         excel_file: Путь к Excel файлу
+        db_path: Путь к SQLite хранилищу (None = работа напрямую с Excel)
+        trello_data: Уже загруженные доски (fetch_boards), None = загрузить здесь
         
     Returns:
         True если успешно
@@ -491,34 +932,35 @@ def sync_trello_to_excel(excel_file: str) -> bool:
     logger.info("СИНХРОНИЗАЦИЯ TRELLO → EXCEL")
     logger.info("=" * 80)
     
-    # Получаем переменные окружения
-    api_key = os.getenv('TRELLO_API_KEY')
-    token = os.getenv('TRELLO_TOKEN')
-    board_id = os.getenv('TRELLO_BOARD_ID')
-    
-    if not all([api_key, token, board_id]):
-        logger.error("❌ Не заданы переменные окружения TRELLO_*")
+    # Создаём парсеры (по одному на доску)
+    parsers = create_parsers()
+    if not parsers:
         return False
     
-    # Создаём парсер
-    parser = TrelloParser(api_key, token, board_id)
+    # Загружаем данные из Trello (если их не загрузили заранее)
+    if trello_data is None:
+        trello_data = fetch_boards(parsers)
+    elif isinstance(trello_data, dict):
+        trello_data = [trello_data]
     
-    # Загружаем данные из Trello
-    cards = parser.get_cards()
-    if not cards:
+    for board in trello_data:
+        logger.info(f"📋 Доска {board.get('name') or board.get('board_id', '?')}: "
+                    f"карточек {len(board['cards'])}, запросов к API: {board.get('requests', '?')}")
+    logger.info(f"📡 Запросов к Trello API за запуск: "
+                f"{sum(board.get('requests', 0) for board in trello_data)}")
+    
+    total_cards = sum(len(board['cards']) for board in trello_data)
+    if not total_cards:
         logger.warning("⚠️ Нет карточек для обработки")
         return False
     
-    labels_map = parser.get_labels()
-    lists_map = parser.get_lists()
-    
     # Загружаем Excel
-    excel = ExcelManager(excel_file)
+    excel = ExcelManager(excel_file, db_path)
     if not excel.load():
         return False
     
     # Обрабатываем карточки
-    logger.info(f"Обработка {len(cards)} карточек...")
+    logger.info(f"Обработка {total_cards} карточек...")
     
     processed = 0
     updated = 0
@@ -526,10 +968,29 @@ def sync_trello_to_excel(excel_file: str) -> bool:
     errors = 0
     skipped = 0
     
-    for card in cards:
+    # Разбор карточки от доски не зависит - доске нужны только её метки и списки
+    parser = parsers[0]
+    parsers_by_board = {p.board_id: p for p in parsers}
+    cards = [(card, board) for board in trello_data for card in board['cards']]
+    refreshed = set()
+    sources = {'custom_fields': 0, 'mixed': 0, 'regex': 0}
+    
+    for card, board in cards:
         try:
+            # Неизвестная метка или список - кэш устарел: перечитываем доску (раз за запуск)
+            board_id = board.get('board_id')
+            if board_id not in refreshed and \
+                    parser.has_unknown_ids(card, board['labels'], board['lists']):
+                refreshed.add(board_id)
+                logger.info(f"🔄 Доска {board_id}: новые метки/списки - обновление кэша")
+                board_parser = parsers_by_board.get(board_id, parser)
+                board.update(board_parser.get_board_meta(use_cache=False))
+            
             # Парсим карточку
-            card_data = parser.parse_card(card, labels_map, lists_map)
+            card_data = parser.parse_card(card, board['labels'], board['lists'],
+                                          board.get('moves'), board.get('field_map'))
+            sources[card_data['fields_source']] += 1
+            logger.debug(f"  Поля карточки {card.get('id')}: {card_data['fields_source']}")
             
             # Пропускаем если нет номера работы
             if not card_data['work_number']:
@@ -567,6 +1028,8 @@ def sync_trello_to_excel(excel_file: str) -> bool:
         logger.warning(f"   - Пропущено (нет номера): {skipped}")
     if errors > 0:
         logger.warning(f"⚠️ Ошибок: {errors}")
+    logger.info(f"   Поля карточек: из пользовательских полей {sources['custom_fields']}, "
+                f"частично из описания {sources['mixed']}, из описания {sources['regex']}")
     logger.info("=" * 80)
     logger.info("")
     logger.info("💡 ВАЖНО: Строки в Excel НЕ удаляются автоматически!")
@@ -581,8 +1044,10 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description='Синхронизация Trello → Excel')
     parser.add_argument('--file', required=True, help='Путь к Excel файлу')
+    parser.add_argument('--db', default=os.getenv('WORKS_DB'),
+                        help='SQLite хранилище строк (по умолчанию WORKS_DB из окружения)')
     
     args = parser.parse_args()
     
-    success = sync_trello_to_excel(args.file)
+    success = sync_trello_to_excel(args.file, args.db)
     sys.exit(0 if success else 1)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность sum_to_words: вызовов в секунду
+
+ИСПОЛЬЗОВАНИЕ:
+    python tests/bench_sum_to_words.py --calls 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'windows'))
+
+import generate_act  # noqa: E402
+
+
+def bench(amounts, label: str):
+    generate_act.rubles_to_words.cache_clear()
+    generate_act._sum_to_words_kop.cache_clear()
+    started = time.perf_counter()
+    for amount in amounts:
+        generate_act.sum_to_words(amount)
+    seconds = time.perf_counter() - started
+    print(f"  {label:<28} {len(amounts):>8} вызовов  {seconds:6.2f} с  "
+          f"{len(amounts) / seconds:>10,.0f} в с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк суммы прописью')
+    parser.add_argument('--calls', type=int, default=200000, help='Вызовов на сценарий')
+    parser.add_argument('--seed', type=int, default=1, help='Зерно случайных сумм')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print("⏱️ sum_to_words:")
+    # Суммы актов: несколько сотен разных значений, повторяются (работает кэш)
+    typical = [rng.choice((1850, 5250, 7100, 14100)) * rng.randint(1, 40) for _ in range(500)]
+    bench([rng.choice(typical) for _ in range(args.calls)], 'типичные суммы актов')
+    # Все суммы разные, с копейками - без попаданий в кэш
+    bench([rng.randint(0, 10 ** 11) / 100 for _ in range(args.calls)], 'случайные суммы')
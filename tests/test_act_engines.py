@@ -0,0 +1,94 @@
+"""
+Движки заполнения актов: xml (act_xml.py) даёт те же ячейки, что openpyxl
+
+Один акт из windows/template.xlsx собирается обоими движками, значения
+ячеек сравниваются лист за листом.
+
+Запуск: python -m pytest tests/
+"""
+
+import os
+import sys
+import glob
+import warnings
+from datetime import datetime
+
+import openpyxl
+import pytest
+from openpyxl.worksheet.formula import ArrayFormula
+
+WINDOWS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'windows')
+sys.path.insert(0, WINDOWS_DIR)
+
+import generate_act  # noqa: E402
+
+TEMPLATE = os.path.join(WINDOWS_DIR, 'template.xlsx')
+HEADERS = ['Номер акта', 'Дата закрытия акта', 'Адрес + Задание', 'Начало работ', 'Конец работ',
+           'Название работ', 'Стоимость (руб)', 'Дата формирования отчета', 'Клиент',
+           'Исполнитель', 'Статус', 'Транзитные адреса', 'Примечание', 'Описание из Trello']
+WORK_TYPES = ['1. Консультации по размещению кабелей ВОЛС',
+              '2. Согласование работ по кабельной трассе с ЖКС/ГУПРЭП',
+              '3. Согласование работ по кабельной трассе с ТСЖ/УК']
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """data.xlsx: один акт из шести работ, стоимость явная и по справочнику"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Работы'
+    ws.append(HEADERS)
+    for i in range(6):
+        ws.append([7, None, f'ул. Тестовая, д. {i}. Задание {10000 + i}',
+                   datetime(2026, 1, 5 + i), datetime(2026, 1, 6 + i), WORK_TYPES[i % 3],
+                   2500.5 if i % 2 else None, datetime(2026, 1, 26), 'ЭТАЛОН', 'ИП',
+                   'Выполнен', 'ул. Транзитная' if i == 3 else None, None, 'desc'])
+    rates = wb.create_sheet('Справочник_Работы')
+    rates.append(['Справочник'])
+    rates.append(['Код', 'Название', 'Цена'])
+    for code, name in enumerate(WORK_TYPES, start=1):
+        rates.append([code, name, 1000 * code + 100])
+    path = str(tmp_path / 'data.xlsx')
+    wb.save(path)
+    return path
+
+
+def render(data_file: str, out_dir: str, engine: str) -> str:
+    os.makedirs(out_dir)
+    generate_act.generate_act(data_file, TEMPLATE, act_numbers=['7'], engine=engine,
+                              use_cache=False, use_index=False, force=True, out_dir=out_dir)
+    files = glob.glob(os.path.join(out_dir, '*.xlsx'))
+    assert len(files) == 1, files
+    return files[0]
+
+
+def cell_value(value):
+    """ArrayFormula сравнивается по объекту - сводим к (диапазон, текст)"""
+    if isinstance(value, ArrayFormula):
+        return 'array', value.ref, value.text
+    return value
+
+
+def sheet_values(path: str) -> dict:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        wb = openpyxl.load_workbook(path)
+    return {
+        ws.title: {
+            cell.coordinate: cell_value(cell.value)
+            for row in ws.iter_rows() for cell in row if cell.value is not None
+        }
+        for ws in wb.worksheets
+    }
+
+
+@pytest.mark.skipif(not os.path.exists(TEMPLATE), reason='нет windows/template.xlsx')
+def test_xml_engine_matches_openpyxl(tmp_path, data_file):
+    expected = sheet_values(render(data_file, str(tmp_path / 'openpyxl'), 'openpyxl'))
+    actual = sheet_values(render(data_file, str(tmp_path / 'xml'), 'xml'))
+
+    assert list(actual) == list(expected)
+    for sheet_name, cells in expected.items():
+        assert actual[sheet_name] == cells, sheet_name
+    # Строки акта действительно записаны
+    assert any('Задание 10005' in str(v) for cells in actual.values() for v in cells.values())
@@ -0,0 +1,106 @@
+"""
+Данные актов (generate_act): книга из памяти full_sync и стоимость строк
+
+Запуск: python -m pytest tests/
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+from hypothesis import given, strategies as st
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'windows'))
+
+import generate_act  # noqa: E402
+
+HEADERS = ['Номер акта', 'Дата закрытия акта', 'Адрес + Задание', 'Начало работ', 'Конец работ',
+           'Название работ', 'Стоимость (руб)', 'Дата формирования отчета', 'Клиент',
+           'Исполнитель', 'Статус', 'Транзитные адреса', 'Примечание', 'Описание из Trello']
+WORK_TYPES = ['1. Консультации по размещению кабелей ВОЛС',
+              '2. Согласование работ по кабельной трассе с ЖКС/ГУПРЭП',
+              '3. Согласование работ по кабельной трассе с ТСЖ/УК']
+RATES = {1: 1100.0, 2: 2100.0, 3: 3100.0}
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """data.xlsx как после sort_excel_by_date: G - формулы VLOOKUP и явные суммы"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Работы'
+    ws.append(HEADERS)
+    costs = ['=VLOOKUP(F{row}, Справочник_Работы!$B$3:$C$9, 2, FALSE)', 2500.5, None]
+    for i in range(6):
+        row = i + 2
+        cost = costs[i % 3]
+        ws.append([1, None, f'ул. Тестовая, д. {i}. Задание {10000 + i}', datetime(2026, 1, 5 + i),
+                   datetime(2026, 1, 6 + i), WORK_TYPES[i % 3],
+                   cost.format(row=row) if isinstance(cost, str) else cost,
+                   datetime(2026, 1, 26), 'ЭТАЛОН', 'ИП', 'Выполнен', None, None, 'desc'])
+    rates = wb.create_sheet('Справочник_Работы')
+    rates.append(['Справочник'])
+    rates.append(['Код', 'Название', 'Цена'])
+    for code, name in enumerate(WORK_TYPES, start=1):
+        rates.append([code, name, RATES[code]])
+    path = str(tmp_path / 'data.xlsx')
+    wb.save(path)
+    return path
+
+
+def frames(path: str, **kwargs):
+    wb = openpyxl.load_workbook(path, **kwargs)
+    try:
+        return generate_act.frames_from_workbook(wb)
+    finally:
+        wb.close()
+
+
+def test_formula_costs_come_from_rates(data_file):
+    df_data, df_rates = frames(data_file)
+    costs = generate_act.compute_costs(df_data, generate_act.load_rates(df_rates))
+    # Формула VLOOKUP → цена по коду, явная сумма остаётся, пустая → цена по коду
+    assert costs.tolist() == [1100.0, 2500.5, 3100.0, 1100.0, 2500.5, 3100.0]
+
+
+def test_book_in_memory_matches_reread(data_file):
+    # full_sync: книга сортировки (с формулами) и повторное чтение с data_only
+    in_memory, rates_in_memory = frames(data_file)
+    reread, rates_reread = frames(data_file, read_only=True, data_only=True)
+    pd.testing.assert_frame_equal(in_memory, reread)
+    pd.testing.assert_frame_equal(rates_in_memory, rates_reread)
+    assert generate_act.act_digest(in_memory) == generate_act.act_digest(reread)
+
+
+ACT_NUMBERS = ['1', '01-3', '007', '0', '00', '+5', '-5', '1.', '1.0', '1.5', ' 2 ', '01- 1',
+               '1e3', '1_000', 'inf', 'nan', 'abc', 'ДОП-2', '１２',
+               '9007199254740993', '12345678901234567890',
+               1, 3, 1.0, 4.0, 2.5, 1e20, float('nan'), None, 12345678901234567890]
+
+
+@pytest.mark.parametrize('dtype', [object, 'float64'])
+def test_act_numbers_match_scalar(dtype):
+    values = pd.Series(ACT_NUMBERS, dtype=object)
+    if dtype == 'float64':
+        values = pd.to_numeric(values, errors='coerce')
+    expected = [generate_act.normalize_act_number(v) for v in values]
+    assert generate_act.normalize_act_numbers(values).tolist() == expected
+
+
+@given(st.lists(st.one_of(
+    st.text(alphabet='0123456789-+._e ', max_size=24),
+    st.integers(min_value=-10 ** 25, max_value=10 ** 25),
+    st.floats(allow_nan=True, allow_infinity=True),
+), max_size=20))
+def test_act_numbers_match_scalar_random(values):
+    values = pd.Series(values, dtype=object)
+    expected = [generate_act.normalize_act_number(v) for v in values]
+    assert generate_act.normalize_act_numbers(values).tolist() == expected
+
+
+def test_act_numbers_empty_and_missing():
+    assert generate_act.normalize_act_numbers(pd.Series([], dtype=object)).tolist() == []
+    assert generate_act.normalize_act_numbers(pd.Series([None, float('nan')])).tolist() == ['', '']
@@ -0,0 +1,148 @@
+"""
+Сумма прописью (generate_act.sum_to_words): свойства на случайных суммах
+
+Запуск: python -m pytest tests/
+"""
+
+import os
+import re
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+from hypothesis import given, strategies as st
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'windows'))
+
+import generate_act  # noqa: E402
+from generate_act import plural_form, rubles_to_words, sum_to_words  # noqa: E402
+
+MAX_RUB = 10 ** 12 - 1
+
+SMALL = {
+    'ноль': 0, 'один': 1, 'одна': 1, 'два': 2, 'две': 2, 'три': 3, 'четыре': 4,
+    'пять': 5, 'шесть': 6, 'семь': 7, 'восемь': 8, 'девять': 9,
+    'десять': 10, 'одиннадцать': 11, 'двенадцать': 12, 'тринадцать': 13,
+    'четырнадцать': 14, 'пятнадцать': 15, 'шестнадцать': 16, 'семнадцать': 17,
+    'восемнадцать': 18, 'девятнадцать': 19,
+    'двадцать': 20, 'тридцать': 30, 'сорок': 40, 'пятьдесят': 50, 'шестьдесят': 60,
+    'семьдесят': 70, 'восемьдесят': 80, 'девяносто': 90,
+    'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400, 'пятьсот': 500,
+    'шестьсот': 600, 'семьсот': 700, 'восемьсот': 800, 'девятьсот': 900,
+}
+SCALES = {
+    ('тысяча', 'тысячи', 'тысяч'): 10 ** 3,
+    ('миллион', 'миллиона', 'миллионов'): 10 ** 6,
+    ('миллиард', 'миллиарда', 'миллиардов'): 10 ** 9,
+}
+FEMININE = {'одна', 'две'}
+SUM_PATTERN = re.compile(r'^(\d+) \((.+)\) (рубль|рубля|рублей), (\d\d) (копейка|копейки|копеек)$')
+
+
+def expected_form(n: int, forms: tuple) -> str:
+    """Независимая от generate_act запись правила: 1 / 2-4 / 5-20, кроме 11-14"""
+    last_two, last = n % 100, n % 10
+    if last == 1 and last_two != 11:
+        return forms[0]
+    if 2 <= last <= 4 and not 12 <= last_two <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def parse_words(text: str):
+    """Слова → (число, [(значение группы, слово разряда, род единиц)])"""
+    total, group, genders, groups = 0, 0, [], []
+    for word in text.lower().split():
+        if word in SMALL:
+            group += SMALL[word]
+            genders.append(word)
+            continue
+        forms, scale = next((forms, scale) for forms, scale in SCALES.items() if word in forms)
+        groups.append((group, word, forms, list(genders)))
+        total += group * scale
+        group, genders = 0, []
+    groups.append((group, None, None, genders))
+    return total + group, groups
+
+
+def split_sum(text: str):
+    match = SUM_PATTERN.match(text)
+    assert match, text
+    return int(match.group(1)), match.group(2), match.group(3), int(match.group(4)), match.group(5)
+
+
+@given(st.integers(min_value=0, max_value=MAX_RUB))
+def test_rubles_round_trip(rub):
+    words = rubles_to_words(rub)
+    assert words[0].isupper()
+    assert parse_words(words)[0] == rub
+
+
+@given(st.integers(min_value=1, max_value=MAX_RUB))
+def test_gender_and_scale_agreement(rub):
+    _, groups = parse_words(rubles_to_words(rub))
+    for value, scale_word, forms, units in groups:
+        if scale_word is None:
+            # Рубли - мужской род: один, два
+            assert not FEMININE & set(units)
+            continue
+        assert value > 0
+        assert scale_word == expected_form(value, forms)
+        if forms[0] == 'тысяча':
+            # Тысяча - женский род: одна тысяча, две тысячи
+            assert not {'один', 'два'} & set(units)
+        else:
+            assert not FEMININE & set(units)
+
+
+@given(st.integers(min_value=0, max_value=MAX_RUB * 100 + 99))
+def test_exact_kopecks(total_kop):
+    amount = Decimal(total_kop) / 100
+    rub, words, rub_form, kop, kop_form = split_sum(sum_to_words(float(amount)))
+    assert (rub, kop) == divmod(total_kop, 100)
+    assert parse_words(words)[0] == rub
+    assert rub_form == expected_form(rub, generate_act._RUB_FORMS)
+    assert kop_form == expected_form(kop, generate_act._KOP_FORMS)
+
+
+@given(st.decimals(min_value=0, max_value=10 ** 9, places=3))
+def test_kopecks_rounded_half_up(amount):
+    rounded = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    rub, _, _, kop, _ = split_sum(sum_to_words(str(amount)))
+    assert rub * 100 + kop == int(rounded * 100)
+    assert 0 <= kop <= 99
+
+
+@given(st.integers(min_value=1, max_value=MAX_RUB * 100))
+def test_negative_is_minus_of_positive(total_kop):
+    amount = float(Decimal(total_kop) / 100)
+    assert sum_to_words(-amount) == f"минус {sum_to_words(amount)}"
+
+
+@pytest.mark.parametrize('amount, expected', [
+    (0, '0 (Ноль) рублей, 00 копеек'),
+    (0.995, '1 (Один) рубль, 00 копеек'),
+    (0.005, '0 (Ноль) рублей, 01 копейка'),
+    (2.675, '2 (Два) рубля, 68 копеек'),
+    (11.11, '11 (Одиннадцать) рублей, 11 копеек'),
+    (14100, '14100 (Четырнадцать тысяч сто) рублей, 00 копеек'),
+    (21001.01, '21001 (Двадцать одна тысяча один) рубль, 01 копейка'),
+    (2000000.22, '2000000 (Два миллиона) рублей, 22 копейки'),
+])
+def test_known_amounts(amount, expected):
+    assert sum_to_words(amount) == expected
+
+
+@pytest.mark.parametrize('amount', [None, '', float('nan')])
+def test_empty_sum_is_zero(amount):
+    assert sum_to_words(amount) == '0 (Ноль) рублей, 00 копеек'
+
+
+def test_too_large():
+    with pytest.raises(ValueError):
+        sum_to_words(10 ** 12)
+
+
+@given(st.integers(min_value=0, max_value=10 ** 6))
+def test_plural_form_matches_rule(n):
+    assert plural_form(n, generate_act._RUB_FORMS) == expected_form(n, generate_act._RUB_FORMS)
@@ -0,0 +1,105 @@
+"""
+Выгрузка хранилища в data.xlsx (works_store.WorksStore.render_excel)
+
+Запуск: python -m pytest tests/
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from works_store import NUM_COLUMNS, SHEET_NAME, WorksStore  # noqa: E402
+
+HEADERS = ['Номер акта', 'Дата закрытия акта', 'Адрес + Задание', 'Начало работ', 'Конец работ',
+           'Название работ', 'Стоимость (руб)', 'Дата формирования отчета', 'Клиент',
+           'Исполнитель', 'Статус', 'Транзитные адреса', 'Примечание', 'Описание из Trello']
+DATE_FORMAT = 'DD.MM.YYYY'
+
+
+def vlookup(row: int) -> str:
+    return f'=VLOOKUP(F{row}, Справочник_Работы!$B$3:$C$9, 2, FALSE)'
+
+
+def work_row(number: int, start: datetime, cost=None) -> list:
+    row = [None] * NUM_COLUMNS
+    row[2] = f'ул. Тестовая, д. {number}. Задание {10000 + number}'
+    row[3] = start
+    row[5] = '1. Консультации по размещению кабелей ВОЛС'
+    row[6] = cost
+    row[7] = datetime(2026, 1, 26)
+    row[10] = 'Выполнен'
+    return row
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """data.xlsx: две строки с датами в формате DD.MM.YYYY и формулой в G"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = SHEET_NAME
+    ws.append(HEADERS)
+    for row_idx, start in enumerate([datetime(2026, 1, 10), datetime(2026, 1, 20)], start=2):
+        ws.append(work_row(row_idx, start, vlookup(row_idx)))
+        for col_idx in (4, 5, 8):
+            ws.cell(row_idx, col_idx).number_format = DATE_FORMAT
+    wb.create_sheet('Справочник_Работы')
+    path = str(tmp_path / 'data.xlsx')
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, data_file):
+    store = WorksStore(str(tmp_path / 'works.sqlite'))
+    store.import_excel(data_file)
+    yield store
+    store.close()
+
+
+def add_row(store: WorksStore, values: list) -> int:
+    sheet = store.sheet()
+    row = sheet.max_row + 1
+    for col_idx, value in enumerate(values, start=1):
+        sheet.cell(row, col_idx).value = value
+    return row
+
+
+def test_new_row_keeps_date_format(store, data_file):
+    # Новая карточка из Trello раньше всех строк - встаёт на строку 2
+    row = add_row(store, work_row(9, datetime(2025, 12, 15), vlookup(4)))
+    assert row == 4
+    store.render_excel(data_file)
+
+    ws = openpyxl.load_workbook(data_file)[SHEET_NAME]
+    assert ws.cell(2, 3).value.endswith('Задание 10009')
+    for col_idx in (4, 8):
+        cell = ws.cell(2, col_idx)
+        assert isinstance(cell.value, datetime)
+        assert cell.is_date
+        assert cell.number_format == DATE_FORMAT
+    assert ws.cell(2, 4).value == datetime(2025, 12, 15)
+
+
+def test_rows_move_with_style_and_formula(store, data_file):
+    add_row(store, work_row(9, datetime(2025, 12, 15), vlookup(4)))
+    store.render_excel(data_file)
+
+    ws = openpyxl.load_workbook(data_file)[SHEET_NAME]
+    for row_idx in range(2, 5):
+        assert ws.cell(row_idx, 7).value == vlookup(row_idx)
+        assert ws.cell(row_idx, 4).number_format == DATE_FORMAT
+
+
+def test_formula_out_of_range_is_kept(store, data_file):
+    # Формула ссылается выше своей строки: сдвиг вверх ушёл бы за строку 1
+    add_row(store, work_row(9, datetime(2025, 12, 15), '=F2'))
+    store.render_excel(data_file)
+
+    ws = openpyxl.load_workbook(data_file)[SHEET_NAME]
+    assert ws.cell(2, 3).value.endswith('Задание 10009')
+    assert ws.cell(2, 7).value == '=F2'
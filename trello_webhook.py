@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+trello_webhook.py - Приём вебхуков Trello и точечное обновление строк
+
+Вместо опроса всей доски: Trello присылает событие об изменении карточки,
+событие проверяется (подпись X-Trello-Webhook) и ставится в очередь.
+События одной карточки склеиваются, и через TRELLO_WEBHOOK_DEBOUNCE секунд
+тишины (но не позже TRELLO_WEBHOOK_MAX_DELAY) изменённые карточки
+перечитываются по одной (GET /cards/{id}), разбираются TrelloParser.parse_card
+и пишутся в книгу в памяти тем же ExcelManager.write_card_data. Затем
+data.xlsx сохраняется и загружается в Dropbox.
+
+Общий data.xlsx никогда не перезаписывается вслепую: файл скачивается при
+старте вместе с ревизией (rev), загрузка идёт с WriteMode.update(rev). Если
+файл в Dropbox изменили (вручную или full_sync), он скачивается заново,
+карточки, ещё не загруженные в Dropbox, применяются к нему повторно, и
+загрузка повторяется.
+
+Строки не сортируются (новые - в конце листа): порядок по датам наводит
+full_sync, с WORKS_DB файл перерисовывается из хранилища уже отсортированным.
+
+ИСПОЛЬЗОВАНИЕ:
+    python trello_webhook.py --file data.xlsx                       # сервер
+    python trello_webhook.py --file data.xlsx --register https://host/trello
+    python trello_webhook.py --file data.xlsx --record events.jsonl # запись событий
+    python trello_webhook.py --file data.xlsx --replay events.jsonl # проигрывание в копию
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import base64
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# logging.basicConfig (лог в /tmp/trello_sync.log) - из sync_trello_severen
+from sync_trello_severen import ExcelManager, TrelloParser, create_parsers, load_card_moves, logger
+from works_store import extract_work_number
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+WEBHOOK_DEBOUNCE = float(os.getenv('TRELLO_WEBHOOK_DEBOUNCE', '5'))
+WEBHOOK_MAX_DELAY = float(os.getenv('TRELLO_WEBHOOK_MAX_DELAY', '60'))
+
+# Адрес приёма (по умолчанию только локальный - снаружи через обратный прокси)
+# и предельный размер тела запроса: больше - отказ до чтения
+WEBHOOK_HOST = os.getenv('TRELLO_WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_MAX_BODY = int(os.getenv('TRELLO_WEBHOOK_MAX_BODY', str(1024 * 1024)))
+
+# Попыток загрузки при конфликте ревизий data.xlsx в Dropbox
+UPLOAD_ATTEMPTS = 3
+
+# События, после которых метки/списки доски в памяти устарели
+META_ACTIONS = {
+    'createLabel', 'updateLabel', 'deleteLabel',
+    'createList', 'updateList',
+    'createCustomField', 'updateCustomField', 'deleteCustomField',
+}
+
+
+def verify_signature(body: bytes, signature: str, callback_url: str, secret: str) -> bool:
+    """
+    Проверка подписи Trello: base64(HMAC-SHA1(секрет приложения, тело + callback URL))
+
+    Args:
+        body: Тело запроса как пришло
+        signature: Заголовок X-Trello-Webhook
+        callback_url: URL, с которым зарегистрирован вебхук (точно как при регистрации)
+        secret: Секрет приложения Trello (TRELLO_API_SECRET)
+    """
+    if not signature:
+        return False
+    digest = hmac.new(secret.encode('utf-8'), body + callback_url.encode('utf-8'),
+                      hashlib.sha1).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode('ascii'), signature)
+
+
+def card_event(payload: Dict) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    Из тела вебхука: (board_id, card_id, тип действия)
+
+    card_id = None у событий не про карточку (метки, списки, доска).
+    """
+    action = payload.get('action') or {}
+    data = action.get('data') or {}
+    board_id = (data.get('board') or {}).get('id') or (payload.get('model') or {}).get('id')
+    card_id = (data.get('card') or {}).get('id')
+    return board_id, card_id, action.get('type', '')
+
+
+class CardQueue:
+    """
+    Очередь изменённых карточек со склейкой по card_id
+
+    Сколько бы событий ни пришло по карточке до сброса, она перечитывается
+    один раз. wait_batch() отдаёт пачку, когда события затихли на debounce
+    секунд или с первого события прошло max_delay.
+    """
+
+    def __init__(self, debounce: float = WEBHOOK_DEBOUNCE, max_delay: float = WEBHOOK_MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.events = 0
+        self._pending: 'OrderedDict[str, str]' = OrderedDict()  # card_id -> board_id
+        self._stale_boards = set()
+        self._first_at = None
+        self._last_at = None
+        self._cond = threading.Condition()
+
+    def push(self, board_id: str, card_id: Optional[str], action_type: str = ''):
+        with self._cond:
+            self.events += 1
+            if action_type in META_ACTIONS:
+                self._stale_boards.add(board_id)
+            if card_id:
+                self._pending.pop(card_id, None)
+                self._pending[card_id] = board_id
+            elif action_type not in META_ACTIONS:
+                return
+            now = time.monotonic()
+            if self._first_at is None:
+                self._first_at = now
+            self._last_at = now
+            self._cond.notify()
+
+    def take(self) -> Tuple[Dict[str, str], set]:
+        """Забрать всё накопленное: ({card_id: board_id}, доски с устаревшими метками)"""
+        with self._cond:
+            return self._take()
+
+    def _take(self):
+        batch, stale = dict(self._pending), set(self._stale_boards)
+        self._pending.clear()
+        self._stale_boards.clear()
+        self._first_at = self._last_at = None
+        return batch, stale
+
+    def wait_batch(self, stop: threading.Event) -> Tuple[Dict[str, str], set]:
+        """Ждать, пока события затихнут; пустая пачка - при остановке"""
+        with self._cond:
+            while not stop.is_set():
+                if self._first_at is None:
+                    self._cond.wait(timeout=1)
+                    continue
+                now = time.monotonic()
+                due = min(self._last_at + self.debounce, self._first_at + self.max_delay)
+                if now >= due:
+                    return self._take()
+                self._cond.wait(timeout=due - now)
+            return self._take()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class WorksModel:
+    """
+    Лист "Работы" в памяти на всё время работы приёмника
+
+    Книга (или WORKS_DB) загружается один раз; строка карточки ищется
+    по словарю номер работы → строка, так что изменение одной карточки
+    не требует прохода по листу. Номера, которых нет в словаре, ищутся
+    обычным ExcelManager.find_row_by_work_number (строки, заполненные
+    вручную в другом формате) и затем запоминаются.
+    """
+
+    def __init__(self, excel_file: str, db_path: Optional[str] = None):
+        self.excel_file = excel_file
+        self.db_path = db_path
+        self.excel = ExcelManager(excel_file, db_path)
+        self.rows: Dict[str, int] = {}
+        self.dirty = False
+
+    def load(self) -> bool:
+        if not self.excel.load():
+            return False
+        self._build_index()
+        return True
+
+    def reload(self) -> bool:
+        """Перечитать data.xlsx (после повторного скачивания из Dropbox)"""
+        self.close()
+        self.excel = ExcelManager(self.excel_file, self.db_path)
+        self.dirty = False
+        return self.load()
+
+    def _build_index(self):
+        self.rows = {}
+        if self.excel.store:
+            return  # у хранилища свой индекс по work_number
+        ws = self.excel.ws
+        for row_idx in range(2, ws.max_row + 1):
+            work_number = extract_work_number(ws.cell(row_idx, 3).value)
+            if work_number and work_number not in self.rows:
+                self.rows[work_number] = row_idx
+        logger.info(f"✅ Индекс номеров работ: {len(self.rows)}")
+
+    def apply(self, card_data: Dict) -> str:
+        """
+        Запись разобранной карточки (parse_card)
+
+        Returns:
+            'created', 'updated' или 'skipped' (нет номера работы)
+        """
+        work_number = card_data['work_number']
+        if not work_number:
+            logger.warning(f"⚠️ Пропуск карточки без номера: {card_data['raw_name'][:50]}")
+            return 'skipped'
+
+        row = self.rows.get(work_number)
+        if row is None:
+            row, exists = self.excel.find_or_create_row(work_number)
+            if not self.excel.store:
+                self.rows[work_number] = row
+        else:
+            exists = True
+
+        self.excel.write_card_data(row, card_data, is_update=exists)
+        self.dirty = True
+        return 'updated' if exists else 'created'
+
+    def save(self) -> bool:
+        """Сохранение data.xlsx; книга (или хранилище) остаётся открытой"""
+        try:
+            if self.excel.store:
+                self.excel.store.render_excel(self.excel.file_path)
+                # render_excel перенумеровывает строки - лист перечитывается
+                self.excel.ws = self.excel.store.sheet()
+            else:
+                self.excel.wb.save(self.excel.file_path)
+                logger.info(f"✅ Файл сохранён: {self.excel.file_path}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения: {e}")
+            return False
+        self.dirty = False
+        return True
+
+    def close(self):
+        if self.excel.store:
+            self.excel.store.close()
+
+
+class WebhookReceiver:
+    """Очередь событий → перечитывание карточек → модель → data.xlsx и Dropbox"""
+
+    def __init__(self, parsers: List[TrelloParser], model: WorksModel,
+                 queue: Optional[CardQueue] = None, dropbox_path: Optional[str] = None,
+                 record_path: Optional[str] = None):
+        """
+        Args:
+            parsers: Парсеры досок (create_parsers); события чужих досок игнорируются
+            model: Загруженный WorksModel
+            queue: Очередь событий (по умолчанию новая CardQueue)
+            dropbox_path: Куда загружать data.xlsx после сброса (None = не загружать)
+            record_path: JSON Lines файл для записи событий и карточек (для --replay)
+        """
+        self.parsers = {p.board_id: p for p in parsers}
+        self.model = model
+        self.queue = queue or CardQueue()
+        self.dropbox_path = dropbox_path
+        self.record_path = record_path
+        # Ревизия data.xlsx в Dropbox, с которой совпадает модель, и карточки,
+        # применённые после неё (повторяются при конфликте ревизий)
+        self.rev: Optional[str] = None
+        self.unsynced: Dict[str, Dict] = {}
+        self.meta: Dict[str, Dict] = {}
+        # Перемещения карточек для "Конец работ": из курсора full_sync + из событий
+        self.moves: Dict[str, Dict] = {
+            board_id: dict(load_card_moves(board_id).get('moves', {})) for board_id in self.parsers
+        }
+        # Снимки карточек из записи: при проигрывании вместо запросов к API
+        self.snapshots: Dict[str, Dict] = {}
+        self.stats = {'events': 0, 'cards': 0, 'requests': 0,
+                      'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0, 'flushes': 0}
+        self._record_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+
+    # --- события ---
+
+    def handle(self, payload: Dict):
+        """Событие вебхука (тело уже проверено) → очередь"""
+        board_id, card_id, action_type = card_event(payload)
+        if board_id not in self.parsers:
+            logger.warning(f"⚠️ Событие {action_type} чужой доски {board_id} - пропуск")
+            return
+        self.record({'payload': payload})
+        action = payload.get('action') or {}
+        list_after = (action.get('data') or {}).get('listAfter')
+        if card_id and list_after and action.get('date'):
+            self.moves[board_id][card_id] = {'list': list_after['id'], 'date': action['date']}
+        self.queue.push(board_id, card_id, action_type)
+
+    def record(self, entry: Dict):
+        if not self.record_path:
+            return
+        with self._record_lock:
+            with open(self.record_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    # --- сброс ---
+
+    def board_meta(self, board_id: str, refresh: bool = False) -> Dict:
+        if refresh or board_id not in self.meta:
+            self.meta[board_id] = self.parsers[board_id].get_board_meta(use_cache=not refresh)
+        return self.meta[board_id]
+
+    def fetch_card(self, card_id: str, board_id: str) -> Optional[Dict]:
+        """Одна карточка: снимок из записи или GET /cards/{id} (None - удалена/недоступна)"""
+        if card_id in self.snapshots:
+            return self.snapshots[card_id]
+        parser = self.parsers[board_id]
+        try:
+            card = parser._get(f"/cards/{card_id}", fields='all', customFieldItems='true')
+        except Exception as e:
+            logger.warning(f"⚠️ Карточка {card_id} не загружена: {e}")
+            return None
+        self.record({'card': card})
+        return card
+
+    def flush(self, batch: Dict[str, str], stale_boards: set = ()) -> bool:
+        """
+        Применить пачку изменённых карточек и сохранить
+
+        Args:
+            batch: {card_id: board_id}
+            stale_boards: Доски, метки/списки которых перечитать
+        """
+        if not batch and not stale_boards:
+            return True
+        started = time.perf_counter()
+        for board_id in stale_boards:
+            if board_id in self.parsers:
+                logger.info(f"🔄 Доска {board_id}: изменились метки/списки")
+                self.board_meta(board_id, refresh=True)
+        if not batch:
+            return True
+
+        requests_before = sum(p.request_count for p in self.parsers.values())
+        workers = min(len(batch), int(os.getenv('SYNC_CONCURRENCY', '4')))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            cards = list(pool.map(lambda item: self.fetch_card(*item), batch.items()))
+
+        refreshed = set()
+        for (card_id, board_id), card in zip(batch.items(), cards):
+            if card is None:
+                continue
+            try:
+                # Карточку могли перенести на другую подключённую доску
+                board_id = card.get('idBoard') if card.get('idBoard') in self.parsers else board_id
+                meta = self.board_meta(board_id)
+                if board_id not in refreshed and \
+                        TrelloParser.has_unknown_ids(card, meta['labels'], meta['lists']):
+                    refreshed.add(board_id)
+                    meta = self.board_meta(board_id, refresh=True)
+                card_data = self.parsers[board_id].parse_card(card, meta['labels'], meta['lists'],
+                                                              self.moves.get(board_id),
+                                                              meta.get('field_map'))
+                self.stats[self.model.apply(card_data)] += 1
+                self.stats['cards'] += 1
+                if self.dropbox_path:
+                    self.unsynced[card_id] = card_data
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки карточки {card_id}: {e}")
+                self.stats['errors'] += 1
+
+        self.stats['requests'] += sum(p.request_count for p in self.parsers.values()) - requests_before
+        self.stats['events'] = self.queue.events
+        if not self.model.dirty:
+            return True
+        if not self.model.save():
+            return False
+        self.stats['flushes'] += 1
+        if self.dropbox_path:
+            self.upload()
+        logger.info(f"⚡ Сброс: карточек {len(batch)} за {time.perf_counter() - started:.2f} с")
+        return True
+
+    def download(self) -> bool:
+        """Скачивание data.xlsx из Dropbox в файл модели; запоминает ревизию"""
+        from dropbox_sync import create_dropbox_client
+
+        try:
+            metadata, response = create_dropbox_client().files_download(self.dropbox_path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка скачивания {self.dropbox_path}: {e}")
+            return False
+        with open(self.model.excel_file, 'wb') as f:
+            f.write(response.content)
+        self.rev = metadata.rev
+        logger.info(f"✅ Скачан из Dropbox: {self.dropbox_path} (rev {self.rev})")
+        return True
+
+    def _rebase(self) -> bool:
+        """Конфликт ревизий: свежий data.xlsx + повторное применение незагруженных карточек"""
+        logger.warning(f"⚠️ {self.dropbox_path} изменён в Dropbox - скачивание и повторное "
+                       f"применение карточек ({len(self.unsynced)})")
+        if not self.download() or not self.model.reload():
+            return False
+        for card_data in self.unsynced.values():
+            self.model.apply(card_data)
+        return self.model.save()
+
+    def upload(self) -> bool:
+        """
+        Загрузка data.xlsx в Dropbox только поверх известной ревизии
+
+        Ошибка не останавливает приём: незагруженные карточки остаются
+        в unsynced и уходят со следующим сбросом.
+        """
+        import dropbox
+        from dropbox_sync import create_dropbox_client
+
+        for _ in range(UPLOAD_ATTEMPTS):
+            mode = dropbox.files.WriteMode.update(self.rev) if self.rev else dropbox.files.WriteMode.add
+            try:
+                with open(self.model.excel_file, 'rb') as f:
+                    metadata = create_dropbox_client().files_upload(
+                        f.read(), self.dropbox_path, mode=mode)
+            except dropbox.exceptions.ApiError as e:
+                error = e.error
+                if error.is_path() and error.get_path().reason.is_conflict():
+                    if self._rebase():
+                        continue
+                logger.error(f"❌ Ошибка загрузки в Dropbox: {e} (повтор при следующем сбросе)")
+                return False
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки в Dropbox: {e} (повтор при следующем сбросе)")
+                return False
+            self.rev = metadata.rev
+            self.unsynced.clear()
+            logger.info(f"✅ Загружен в Dropbox: {self.dropbox_path} (rev {self.rev})")
+            return True
+
+        logger.error(f"❌ {self.dropbox_path} продолжает меняться в Dropbox - повтор при следующем сбросе")
+        return False
+
+    # --- фоновый сброс ---
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch, stale = self.queue.wait_batch(self._stop)
+            try:
+                self.flush(batch, stale)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сброса: {e}")
+
+    def start(self):
+        self._worker = threading.Thread(target=self._run, name='webhook-flush', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Остановка: накопленные события сбрасываются"""
+        self._stop.set()
+        self.queue.wake()
+        if self._worker:
+            self._worker.join()
+        self.flush(*self.queue.take())
+
+
+def make_handler(receiver: WebhookReceiver, secret: Optional[str], callback_url: Optional[str]):
+    """
+    Класс обработчика HTTP для ThreadingHTTPServer
+
+    secret = None - подпись не проверяется (только с --insecure).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            # Trello проверяет callback URL HEAD-запросом при регистрации
+            self.send_response(200)
+            self.end_headers()
+
+        def do_GET(self):
+            self.do_HEAD()
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', ''))
+            except ValueError:
+                self.send_response(411)
+                self.end_headers()
+                return
+            if length < 0 or length > WEBHOOK_MAX_BODY:
+                logger.warning(f"⚠️ Вебхук размером {length} байт - отклонён")
+                self.send_response(413)
+                self.end_headers()
+                return
+            body = self.rfile.read(length)
+            if secret and not verify_signature(body, self.headers.get('X-Trello-Webhook', ''),
+                                               callback_url, secret):
+                logger.warning("⚠️ Вебхук с неверной подписью - отклонён")
+                self.send_response(401)
+                self.end_headers()
+                return
+            try:
+                receiver.handle(json.loads(body))
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            # Ответ сразу: работа - в фоновом сбросе, Trello не ждёт
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def register_webhook(parser: TrelloParser, callback_url: str) -> Dict:
+    """Регистрация вебхука доски (POST /webhooks); Trello сразу проверит URL HEAD-запросом"""
+    response = parser.session.post(f"{parser.base_url}/webhooks", params={
+        'key': parser.api_key, 'token': parser.token,
+        'idModel': parser.board_id, 'callbackURL': callback_url,
+        'description': f'severen {parser.board_id}',
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+def replay(receiver: WebhookReceiver, record_path: str) -> Dict:
+    """
+    Проигрывание записанных событий (--record) без сервера
+
+    Строки файла: {"payload": тело вебхука} или {"card": снимок карточки};
+    строки без обёртки считаются телом вебхука. Снимки подменяют запросы
+    к API, так что запись проигрывается и без доступа к Trello.
+
+    Returns:
+        Статистика приёмника
+    """
+    with open(record_path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'card' in entry:
+                receiver.snapshots[entry['card']['id']] = entry['card']
+            else:
+                receiver.handle(entry.get('payload', entry))
+    receiver.flush(*receiver.queue.take())
+    return receiver.stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Приём вебхуков Trello → Excel')
+    arg_parser.add_argument('--file', default='data.xlsx', help='Путь к Excel файлу')
+    arg_parser.add_argument('--db', default=os.getenv('WORKS_DB'),
+                            help='SQLite хранилище строк (по умолчанию WORKS_DB из окружения)')
+    arg_parser.add_argument('--host', default=WEBHOOK_HOST,
+                            help='Адрес приёма (по умолчанию 127.0.0.1, TRELLO_WEBHOOK_HOST)')
+    arg_parser.add_argument('--port', type=int, default=int(os.getenv('TRELLO_WEBHOOK_PORT', '8080')))
+    arg_parser.add_argument('--insecure', action='store_true',
+                            help='Принимать вебхуки без проверки подписи (только для отладки)')
+    arg_parser.add_argument('--no-upload', action='store_true', help='Не загружать data.xlsx в Dropbox')
+    arg_parser.add_argument('--record', help='Записывать события и карточки в JSON Lines файл')
+    arg_parser.add_argument('--replay', help='Проиграть записанный файл в копию --file и выйти')
+    arg_parser.add_argument('--replay-out', help='Куда писать при --replay (по умолчанию <file>.replay.xlsx)')
+    arg_parser.add_argument('--register', metavar='URL', help='Зарегистрировать вебхук всех досок и выйти')
+    args = arg_parser.parse_args()
+
+    parsers = create_parsers()
+    if not parsers:
+        sys.exit(1)
+
+    if args.register:
+        for board_parser in parsers:
+            webhook = register_webhook(board_parser, args.register)
+            logger.info(f"✅ Вебхук {webhook.get('id')} доски {board_parser.board_id}")
+        sys.exit(0)
+
+    if args.replay:
+        # Проигрывание не трогает ни рабочий data.xlsx, ни WORKS_DB - только копию
+        replay_file = args.replay_out or f"{os.path.splitext(args.file)[0]}.replay.xlsx"
+        if os.path.abspath(replay_file) == os.path.abspath(args.file):
+            logger.error("❌ --replay-out совпадает с --file")
+            sys.exit(1)
+        shutil.copy(args.file, replay_file)
+        logger.info(f"📋 Проигрывание в копию: {replay_file}")
+        model = WorksModel(replay_file)
+        if not model.load():
+            sys.exit(1)
+        receiver = WebhookReceiver(parsers, model)
+        stats = replay(receiver, args.replay)
+        model.close()
+        logger.info(f"📊 Событий: {stats['events']}, карточек: {stats['cards']} "
+                    f"(создано {stats['created']}, обновлено {stats['updated']}, "
+                    f"пропущено {stats['skipped']}, ошибок {stats['errors']}), "
+                    f"запросов к API: {stats['requests']}")
+        sys.exit(0 if not stats['errors'] else 1)
+
+    secret = os.getenv('TRELLO_API_SECRET')
+    callback_url = os.getenv('TRELLO_WEBHOOK_URL')
+    if not (secret and callback_url):
+        if not args.insecure:
+            logger.error("❌ Не заданы TRELLO_API_SECRET и TRELLO_WEBHOOK_URL - без проверки "
+                         "подписи приём возможен только с --insecure")
+            sys.exit(1)
+        logger.warning("⚠️ --insecure: подпись вебхуков не проверяется")
+        secret = None
+
+    dropbox_path = None if args.no_upload else os.getenv('DROPBOX_DATA_PATH', '/data.xlsx')
+    model = WorksModel(args.file, args.db)
+    receiver = WebhookReceiver(parsers, model, dropbox_path=dropbox_path, record_path=args.record)
+    # Модель начинается с текущей ревизии из Dropbox - иначе загрузки не с чем сверять
+    if dropbox_path and not receiver.download():
+        sys.exit(1)
+    if not model.load():
+        sys.exit(1)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(receiver, secret, callback_url))
+    receiver.start()
+    logger.info(f"🚀 Приём вебхуков Trello на {args.host}:{args.port} "
+                f"(склейка {WEBHOOK_DEBOUNCE:g} с, не дольше {WEBHOOK_MAX_DELAY:g} с)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("⏹️ Остановлено пользователем")
+    finally:
+        server.server_close()
+        receiver.stop()
+        model.close()
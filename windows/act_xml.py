@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+act_xml.py - Заполнение template.xlsx на уровне XML (без openpyxl)
+
+ОПИСАНИЕ:
+- template.xlsx читается как zip один раз
+- В каждом акте патчатся только XML затронутых листов (C5, строки 13+,
+  строка суммы и строка суммы прописью) и sharedStrings.xml
+- Все остальные части (стили, рисунки, печать) копируются байт-в-байт
+- calcChain.xml убирается, в workbook.xml ставится fullCalcOnLoad,
+  как это делает openpyxl при сохранении
+- Ячейки с пустой общей строкой становятся пустыми, как после openpyxl
+  (tests/test_act_engines.py сверяет значения ячеек обоих движков)
+
+СРАВНЕНИЕ С OPENPYXL:
+    python act_xml.py --data "data.xlsx" --template "template.xlsx" --repeat 3
+"""
+
+import re
+import numbers
+import zipfile
+from io import BytesIO
+from bisect import bisect_left
+from xml.sax.saxutils import escape, unescape
+from xml.etree import ElementTree
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import get_column_letter, range_boundaries
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+ROW_RE = re.compile(r'<row\b[^>]*?\sr="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+CELL_RE = re.compile(r'<c\b[^>]*?\sr="([A-Z]+\d+)"[^>]*?(?:/>|>.*?</c>)', re.S)
+ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+FORMULA_RE = re.compile(r'<f\b([^>]*?)(?:/>|>(.*?)</f>)', re.S)
+MERGE_RE = re.compile(r'<mergeCell\b[^>]*?\sref="([A-Z0-9:]+)"')
+SI_RE = re.compile(r'<si[\s>/]')
+SI_ITEM_RE = re.compile(r'<si\b[^>]*?(?:/>|>(.*?)</si>)', re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _attrs(tag: str) -> dict:
+    """Атрибуты открывающего тега"""
+    head = tag[:tag.index('>') + 1]
+    return dict(ATTR_RE.findall(head))
+
+
+def _xml_text(value: str) -> str:
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise ValueError(f"Недопустимые символы в значении ячейки: {value!r}")
+    return escape(value)
+
+
+class _StringTable:
+    """Новые строки акта, дописываемые в конец sharedStrings.xml"""
+
+    def __init__(self, base: int):
+        self.base = base
+        self.strings = []
+        self.index = {}
+
+    def add(self, value: str) -> int:
+        if value not in self.index:
+            self.index[value] = self.base + len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+    def patch(self, sst: bytes, refs: int) -> bytes:
+        xml = sst.decode('utf-8')
+        items = ''.join(
+            f'<si><t xml:space="preserve">{_xml_text(s)}</t></si>' for s in self.strings
+        )
+        end = xml.rindex('</sst>')
+        xml = xml[:end] + items + xml[end:]
+
+        head_end = xml.index('>', xml.index('<sst')) + 1
+        head = xml[:head_end]
+        unique = self.base + len(self.strings)
+        head = re.sub(r'\suniqueCount="\d+"', f' uniqueCount="{unique}"', head)
+        count = re.search(r'\scount="(\d+)"', head)
+        if count:
+            head = head.replace(count.group(0), f' count="{int(count.group(1)) + refs}"')
+        return (head + xml[head_end:]).encode('utf-8')
+
+
+class XlsxTemplate:
+    """
+    template.xlsx как набор частей zip
+
+    Разбирается один раз; render() собирает акт, подменяя только
+    XML листов с изменёнными ячейками и sharedStrings.xml.
+    """
+
+    def __init__(self, raw: bytes):
+        self.key = None
+        self.parts = {}
+        self.infos = []
+        with zipfile.ZipFile(BytesIO(raw)) as zf:
+            for info in zf.infolist():
+                self.infos.append(info)
+                self.parts[info.filename] = zf.read(info)
+
+        self.sheet_parts = self._sheet_parts()
+        self.sheetnames = list(self.sheet_parts)
+        self._merged = {}
+        self._index = {}
+
+        sst = self.parts.get('xl/sharedStrings.xml')
+        self.sst_size = len(SI_RE.findall(sst.decode('utf-8'))) if sst else 0
+        if sst:
+            self._drop_empty_strings(sst.decode('utf-8'))
+
+    def _drop_empty_strings(self, sst: str):
+        """
+        Ячейки с пустой общей строкой → пустые ячейки (со стилем)
+
+        openpyxl при сохранении не пишет значение '' - такая ячейка
+        в его акте пустая (None). Чтобы акты обоих движков совпадали,
+        шаблон приводится к тому же виду один раз при разборе.
+        """
+        empty = {
+            str(i) for i, m in enumerate(SI_ITEM_RE.finditer(sst))
+            if not TAG_RE.sub('', m.group(1) or '')
+        }
+        if not empty:
+            return
+
+        dropped = 0
+
+        def drop(m):
+            nonlocal dropped
+            cell_xml = m.group(0)
+            attrs = _attrs(cell_xml)
+            value = re.search(r'<v>(\d+)</v>', cell_xml)
+            if attrs.get('t') != 's' or value is None or value.group(1) not in empty:
+                return cell_xml
+            dropped += 1
+            s = f' s="{attrs["s"]}"' if 's' in attrs else ''
+            return f'<c r="{m.group(1)}"{s}/>'
+
+        for part in self.sheet_parts.values():
+            self.parts[part] = CELL_RE.sub(drop, self.parts[part].decode('utf-8')).encode('utf-8')
+
+        count = re.search(r'(<sst\b[^>]*?\scount=")(\d+)"', sst)
+        if dropped and count:
+            sst = sst.replace(count.group(0), f'{count.group(1)}{int(count.group(2)) - dropped}"', 1)
+            self.parts['xl/sharedStrings.xml'] = sst.encode('utf-8')
+
+    def _sheet_parts(self) -> dict:
+        """Имя листа → путь XML листа в архиве (в порядке книги)"""
+        rels = ElementTree.fromstring(self.parts['xl/_rels/workbook.xml.rels'])
+        targets = {}
+        for rel in rels.findall(f'{{{NS_PKG_REL}}}Relationship'):
+            target = rel.get('Target')
+            targets[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+
+        workbook = ElementTree.fromstring(self.parts['xl/workbook.xml'])
+        return {
+            sheet.get('name'): targets[sheet.get(f'{{{NS_REL}}}id')]
+            for sheet in workbook.iter(f'{{{NS_MAIN}}}sheet')
+        }
+
+    def merged(self, sheet_name: str) -> set:
+        """Ячейки листа, закрытые объединением (кроме левой верхней)"""
+        if sheet_name not in self._merged:
+            xml = self.parts[self.sheet_parts[sheet_name]].decode('utf-8')
+            covered = set()
+            for ref in MERGE_RE.findall(xml):
+                if ':' not in ref:
+                    continue
+                min_col, min_row, max_col, max_row = range_boundaries(ref)
+                for row in range(min_row, max_row + 1):
+                    for col in range(min_col, max_col + 1):
+                        if (row, col) != (min_row, min_col):
+                            covered.add((row, col))
+            self._merged[sheet_name] = covered
+        return self._merged[sheet_name]
+
+    # --- ячейки ---
+
+    def _cell_xml(self, coord: str, style: str, value, strings: _StringTable) -> str:
+        s = f' s="{style}"' if style else ''
+        if value is None:
+            return f'<c r="{coord}"{s}/>'
+        if isinstance(value, bool):
+            return f'<c r="{coord}"{s} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Integral):
+            return f'<c r="{coord}"{s}><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Real):
+            return f'<c r="{coord}"{s}><v>{float(value)!r}</v></c>'
+        value = str(value)
+        if value.startswith('=') and len(value) > 1:
+            return f'<c r="{coord}"{s}><f>{_xml_text(value[1:])}</f></c>'
+        if strings is None:
+            return f'<c r="{coord}"{s} t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+        return f'<c r="{coord}"{s} t="s"><v>{strings.add(value)}</v></c>'
+
+    def _sheet_index(self, sheet_name: str) -> dict:
+        """
+        Разметка XML листа (считается один раз на шаблон): части до/после
+        sheetData, позиции строк и мастер-ячейки shared-формул
+        """
+        if sheet_name in self._index:
+            return self._index[sheet_name]
+
+        xml = self.parts[self.sheet_parts[sheet_name]].decode('utf-8')
+        start = xml.find('<sheetData')
+        head_end = xml.index('>', start) + 1
+        if xml[head_end - 2] == '/':
+            head = xml[:head_end - 2] + '>'
+            data, tail = '', '</sheetData>' + xml[head_end:]
+        else:
+            end = xml.index('</sheetData>', head_end)
+            head, data, tail = xml[:head_end], xml[head_end:end], xml[end:]
+
+        rows = [(int(m.group(1)), m.start(), m.end()) for m in ROW_RE.finditer(data)]
+
+        masters = {}
+        for m in CELL_RE.finditer(data):
+            f = FORMULA_RE.search(m.group(0))
+            if f is None:
+                continue
+            f_attrs = dict(ATTR_RE.findall(f.group(1)))
+            if f_attrs.get('t') == 'shared' and 'ref' in f_attrs:
+                masters[f_attrs['si']] = (m.group(1), unescape(f.group(2) or ''), f_attrs['ref'])
+
+        self._index[sheet_name] = {
+            'head': head, 'data': data, 'tail': tail,
+            'rows': rows, 'row_numbers': [r[0] for r in rows], 'masters': masters,
+        }
+        return self._index[sheet_name]
+
+    def _patch_sheet(self, sheet_name: str, cells: dict, strings: _StringTable) -> tuple:
+        """
+        Подмена ячеек {(строка, колонка): значение} в XML листа
+
+        Меняются только строки с подменяемыми ячейками, остальной XML
+        склеивается кусками исходного. Общие (shared) формулы, затронутые
+        подменой, разворачиваются в обычные - иначе зависимые ячейки
+        потеряли бы мастер-формулу.
+
+        Returns:
+            (новый XML, число ссылок на sharedStrings)
+        """
+        index = self._sheet_index(sheet_name)
+        data = index['data']
+
+        targets = {}
+        for (row, col), value in cells.items():
+            targets.setdefault(row, {})[col] = value
+
+        unshare = {}
+        for si, (coord, text, ref) in index['masters'].items():
+            min_col, min_row, max_col, max_row = range_boundaries(ref)
+            if any(min_row <= r <= max_row and min_col <= c <= max_col for r, c in cells):
+                unshare[si] = (coord, text)
+                for r in range(min_row, max_row + 1):
+                    targets.setdefault(r, {})
+
+        refs = 0
+
+        def patch_row(row_num: int, row_xml: str) -> str:
+            nonlocal refs
+            row_cells = targets[row_num]
+            if row_xml.endswith('/>'):
+                open_tag, body = row_xml[:-2] + '>', ''
+            else:
+                open_tag = row_xml[:row_xml.index('>') + 1]
+                body = row_xml[len(open_tag):-len('</row>')]
+            open_tag = re.sub(r'\sspans="[^"]*"', '', open_tag)
+
+            out = []
+            pending = sorted(row_cells)
+            for m in CELL_RE.finditer(body):
+                coord = m.group(1)
+                col = column_index_from_string(coordinate_from_string(coord)[0])
+                while pending and pending[0] < col:
+                    c = pending.pop(0)
+                    out.append(self._cell_xml(f'{get_column_letter(c)}{row_num}', '',
+                                              row_cells[c], strings))
+                cell_xml = m.group(0)
+                if pending and pending[0] == col:
+                    pending.pop(0)
+                    style = _attrs(cell_xml).get('s', '')
+                    cell_xml = self._cell_xml(coord, style, row_cells[col], strings)
+                elif unshare:
+                    cell_xml = self._unshare(cell_xml, coord, unshare)
+                out.append(cell_xml)
+            for c in pending:
+                out.append(self._cell_xml(f'{get_column_letter(c)}{row_num}', '',
+                                          row_cells[c], strings))
+            refs += sum(1 for v in row_cells.values() if isinstance(v, str)
+                        and not (v.startswith('=') and len(v) > 1))
+            return open_tag + ''.join(out) + '</row>'
+
+        # Склейка: куски исходного XML между подменёнными/новыми строками
+        out = []
+        pos = 0
+        rows, row_numbers = index['rows'], index['row_numbers']
+        for row_num in sorted(targets):
+            i = bisect_left(row_numbers, row_num)
+            if i < len(rows) and row_numbers[i] == row_num:
+                _, start, end = rows[i]
+                out.append(data[pos:start])
+                out.append(patch_row(row_num, data[start:end]))
+                pos = end
+            else:
+                # Новая строка - перед первой строкой с большим номером
+                insert_at = rows[i][1] if i < len(rows) else len(data)
+                out.append(data[pos:insert_at])
+                out.append(patch_row(row_num, f'<row r="{row_num}"/>'))
+                pos = insert_at
+        out.append(data[pos:])
+
+        return index['head'] + ''.join(out) + index['tail'], refs
+
+    @staticmethod
+    def _unshare(cell_xml: str, coord: str, unshare: dict) -> str:
+        """Shared-формула ячейки → обычная формула (с пересчётом ссылок)"""
+        f = FORMULA_RE.search(cell_xml)
+        if f is None:
+            return cell_xml
+        f_attrs = dict(ATTR_RE.findall(f.group(1)))
+        if f_attrs.get('t') != 'shared' or f_attrs.get('si') not in unshare:
+            return cell_xml
+        master_coord, text = unshare[f_attrs['si']]
+        formula = Translator(f'={text}', origin=master_coord).translate_formula(coord)
+        return cell_xml[:f.start()] + f'<f>{escape(formula[1:])}</f>' + cell_xml[f.end():]
+
+    # --- книга ---
+
+    def _workbook_parts(self) -> dict:
+        """workbook.xml / rels / [Content_Types].xml без calcChain и с пересчётом при открытии"""
+        patched = {}
+
+        workbook = self.parts['xl/workbook.xml'].decode('utf-8')
+        calc = re.search(r'<calcPr\b[^>]*?/>', workbook)
+        if calc and 'fullCalcOnLoad' not in calc.group(0):
+            workbook = workbook.replace(calc.group(0), calc.group(0)[:-2] + ' fullCalcOnLoad="1"/>')
+        elif calc is None:
+            workbook = workbook.replace('</workbook>', '<calcPr fullCalcOnLoad="1"/></workbook>')
+        patched['xl/workbook.xml'] = workbook.encode('utf-8')
+
+        rels = self.parts['xl/_rels/workbook.xml.rels'].decode('utf-8')
+        rels = re.sub(r'<Relationship\b[^>]*?Target="[^"]*calcChain\.xml"[^>]*/>', '', rels)
+        patched['xl/_rels/workbook.xml.rels'] = rels.encode('utf-8')
+
+        types = self.parts['[Content_Types].xml'].decode('utf-8')
+        types = re.sub(r'<Override\b[^>]*?PartName="/xl/calcChain\.xml"[^>]*/>', '', types)
+        patched['[Content_Types].xml'] = types.encode('utf-8')
+
+        return patched
+
+    def render(self, out_path: str, edits: dict) -> list:
+        """
+        Собрать акт: edits = {лист: [(строка, колонка, значение), ...]}
+
+        Returns:
+            Пропущенные объединённые ячейки в виде "'Лист'!A1"
+        """
+        sst = self.parts.get('xl/sharedStrings.xml')
+        strings = _StringTable(self.sst_size) if sst is not None else None
+        patched = self._workbook_parts()
+        skipped = []
+        refs = 0
+
+        for sheet_name, cells in edits.items():
+            merged = self.merged(sheet_name)
+            values = {}
+            for row, col, value in cells:
+                if (row, col) in merged:
+                    skipped.append(f"'{sheet_name}'!{get_column_letter(col)}{row}")
+                    continue
+                values[(row, col)] = value
+            if not values:
+                continue
+            xml, sheet_refs = self._patch_sheet(sheet_name, values, strings)
+            patched[self.sheet_parts[sheet_name]] = xml.encode('utf-8')
+            refs += sheet_refs
+
+        if strings is not None and strings.strings:
+            patched['xl/sharedStrings.xml'] = strings.patch(sst, refs)
+
+        with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for info in self.infos:
+                if info.filename == 'xl/calcChain.xml':
+                    continue
+                data = patched.get(info.filename, self.parts[info.filename])
+                zf.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED)
+
+        return skipped
+
+
+if __name__ == '__main__':
+    import time
+    import shutil
+    import argparse
+    import tempfile
+    import warnings
+
+    import generate_act
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    parser = argparse.ArgumentParser(description="Сравнение движков заполнения актов: openpyxl / xml")
+    parser.add_argument('--data', required=True, help='Файл данных (*.xlsx)')
+    parser.add_argument('--template', required=True, help='Шаблон акта (*.xlsx)')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов на движок')
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix='acts_bench_')
+    timings = {}
+    try:
+        for engine in ('openpyxl', 'xml'):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                # force: манифест актов иначе пропустил бы уже собранные акты
+                results = generate_act.generate_act(args.data, args.template, all_acts=True,
+                                                    engine=engine, force=True, out_dir=out_dir)
+            timings[engine] = (time.perf_counter() - started) / args.repeat, len(results)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print("\n⏱️ СРАВНЕНИЕ ДВИЖКОВ (среднее на запуск):")
+    for engine, (seconds, acts) in timings.items():
+        print(f"  {engine:>8}: {seconds:.2f} с на {acts} акт(ов), {seconds / max(acts, 1):.3f} с/акт")
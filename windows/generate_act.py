@@ -13,68 +13,139 @@ generate_act.py - Генерация акта выполненных работ
 
 ИСПОЛЬЗОВАНИЕ:
     python generate_act.py --data "data.xlsx" --template "template.xlsx"
+    python generate_act.py --data "data.xlsx" --template "template.xlsx" --db "works.sqlite"
+    python generate_act.py --data "data.xlsx" --template "template.xlsx" --all
+    python generate_act.py --data "data.xlsx" --template "template.xlsx" --acts 1,2,5
+
+    python generate_act.py --data "data.xlsx" --template "template.xlsx" --all --jobs 4
+
+--all / --acts генерируют несколько актов за один запуск: данные и шаблон
+читаются один раз, строки группируются по номеру акта. --jobs N заполняет
+и сохраняет акты в N процессах. --engine xml заполняет шаблон патчем XML
+(act_xml.py) вместо объектной модели openpyxl.
+
+С --db строки акта выбираются индексированным запросом из SQLite хранилища
+(works_store.py), которое строится из data.xlsx и обновляется при его изменении.
 
 МАППИНГ ЯЧЕЕК (строка 13+ шаблона):
 - ЗАДАНИЕ (левая часть):  A=адрес, B=нач.дата, C=конц.дата, D=вид услуги
 - ОТЧЕТ (правая часть):   G=адрес, H=нач.дата, I=конц.дата, J=вид услуги, K=стоимость
 """
 
+import os
+import sys
+import pickle
+import json
+import hashlib
 import argparse
+import numpy as np
 import pandas as pd
+import openpyxl
 from openpyxl import load_workbook
 from datetime import datetime, timedelta
+import time
 import warnings
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
-def sum_to_words(amount: float) -> str:
-    """Сумма прописью: 14100 (Четырнадцать тысяч сто) рублей, 00 копеек"""
-    rub = int(amount)
-    kop = int(round((amount - rub) * 100))
-
-    units = [
-        '', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять',
-        'десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать', 'пятнадцать',
-        'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать'
-    ]
-    tens = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят', 'шестьдесят',
-            'семьдесят', 'восемьдесят', 'девяносто']
-    hundreds = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот', 'шестьсот',
-                'семьсот', 'восемьсот', 'девятьсот']
-    thousands = ['', 'тысяча', 'тысячи', 'тысяч']
-
-    def chunk(n: int) -> str:
-        if n == 0:
-            return ''
-        if n < 20:
-            return units[n]
-        if n < 100:
-            return tens[n // 10] + (' ' + units[n % 10] if n % 10 else '')
-        return hundreds[n // 100] + (' ' + chunk(n % 100) if n % 100 else '')
-
-    def group(n: int, words: list) -> str:
-        if n == 0:
-            return ''
-        if n == 1:
-            return words[1]
-        if 2 <= n <= 4:
-            return chunk(n) + ' ' + words[2]
-        return chunk(n) + ' ' + words[3]
+# === СУММА ПРОПИСЬЮ: таблицы строятся один раз при импорте ===
+_UNITS_M = ['', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
+_UNITS_F = ['', 'одна', 'две'] + _UNITS_M[3:]
+_TEENS = ['десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать', 'пятнадцать',
+          'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать']
+_TENS = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят', 'шестьдесят',
+         'семьдесят', 'восемьдесят', 'девяносто']
+_HUNDREDS = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот', 'шестьсот',
+             'семьсот', 'восемьсот', 'девятьсот']
+
+# Разряды: (род, формы для 1 / 2-4 / 5-20), от младшего к старшему
+_SCALES = [
+    ('m', ('', '', '')),
+    ('f', ('тысяча', 'тысячи', 'тысяч')),
+    ('m', ('миллион', 'миллиона', 'миллионов')),
+    ('m', ('миллиард', 'миллиарда', 'миллиардов')),
+]
+_MAX_RUB = 1000 ** len(_SCALES) - 1
+
+_RUB_FORMS = ('рубль', 'рубля', 'рублей')
+_KOP_FORMS = ('копейка', 'копейки', 'копеек')
+
+
+def _chunk_words(n: int, gender: str) -> list:
+    """0..999 прописью с нужным родом единиц"""
+    units = _UNITS_F if gender == 'f' else _UNITS_M
+    words = [_HUNDREDS[n // 100]]
+    rest = n % 100
+    if 10 <= rest < 20:
+        words.append(_TEENS[rest - 10])
+    else:
+        words += [_TENS[rest // 10], units[rest % 10]]
+    return [w for w in words if w]
+
+
+# Все тройки цифр заранее: (число, род) → слова
+_CHUNKS = {
+    (n, gender): _chunk_words(n, gender) for n in range(1000) for gender in ('m', 'f')
+}
+
+
+def plural_form(n: int, forms: tuple) -> str:
+    """Форма слова для числа: 1 рубль, 2 рубля, 5 рублей, 11 рублей, 21 рубль"""
+    n = abs(n) % 100
+    if 11 <= n <= 19:
+        return forms[2]
+    n %= 10
+    if n == 1:
+        return forms[0]
+    if 2 <= n <= 4:
+        return forms[1]
+    return forms[2]
 
+
+@lru_cache(maxsize=4096)
+def rubles_to_words(rub: int) -> str:
+    """Целое число рублей прописью (до миллиардов), с заглавной буквы"""
     if rub == 0:
-        rub_text = 'ноль'
-    else:
-        parts = []
-        if rub >= 1000:
-            t = rub // 1000
-            parts.append(group(t, thousands))
-            rub %= 1000
-        if rub > 0:
-            parts.append(chunk(rub))
-        rub_text = ' '.join(parts).strip().capitalize()
+        return 'Ноль'
+    if rub > _MAX_RUB:
+        raise ValueError(f"Сумма прописью поддерживается до {_MAX_RUB}: {rub}")
+
+    words = []
+    for scale, (gender, forms) in enumerate(_SCALES):
+        group = (rub // 1000 ** scale) % 1000
+        if group == 0:
+            continue
+        part = list(_CHUNKS[(group, gender)])
+        if scale:
+            part.append(plural_form(group, forms))
+        words = part + words
+    return ' '.join(words).capitalize()
 
-    return f"{int(amount)} ({rub_text}) рублей, {kop:02d} копеек"
+
+@lru_cache(maxsize=4096)
+def _sum_to_words_kop(total_kop: int) -> str:
+    rub, kop = divmod(total_kop, 100)
+    return (f"{rub} ({rubles_to_words(rub)}) {plural_form(rub, _RUB_FORMS)}, "
+            f"{kop:02d} {plural_form(kop, _KOP_FORMS)}")
+
+
+def sum_to_words(amount: float) -> str:
+    """
+    Сумма прописью: 14100 (Четырнадцать тысяч сто) рублей, 00 копеек
+
+    Пустая сумма (None, '', NaN) - ноль, как у суммы пустого столбца стоимости.
+    """
+    if amount is None or amount == '' or pd.isna(amount):
+        amount = 0
+    total_kop = int(Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+    if total_kop < 0:
+        return f"минус {_sum_to_words_kop(-total_kop)}"
+    return _sum_to_words_kop(total_kop)
 
 
 def to_date(val):
@@ -88,6 +159,61 @@ def to_date(val):
     return str(val)
 
 
+DATE_FORMAT = '%d.%m.%Y'
+EXCEL_EPOCH = '1899-12-30'
+
+# Даты, введённые текстом (день первым)
+STRING_DATE_FORMATS = ('%d.%m.%Y', '%d.%m.%y', '%d/%m/%Y', '%d-%m-%Y',
+                       '%d.%m.%Y %H:%M:%S', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S')
+
+
+def format_dates(values: pd.Series) -> pd.Series:
+    """
+    to_date для целой колонки: даты, серийные номера Excel и строки → dd.mm.yyyy
+
+    Серийные номера переводятся одним pd.to_datetime(origin=1899-12-30,
+    unit='D'), строки - по STRING_DATE_FORMATS; нераспознанный текст
+    остаётся как есть, пустые значения → ''.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime(DATE_FORMAT).fillna('').astype(object)
+
+    result = pd.Series('', index=values.index, dtype=object)
+    present = values.notna()
+    if not present.any():
+        return result
+
+    kinds = values.map(type)
+    is_str = present & (kinds == str)
+    is_num = present & ~is_str & values.map(lambda v: isinstance(v, (int, float, np.number))
+                                            and not isinstance(v, bool))
+    is_other = present & ~is_str & ~is_num
+
+    if is_num.any():
+        serials = pd.to_datetime(values[is_num].astype(float), unit='D', origin=EXCEL_EPOCH)
+        result[is_num] = serials.dt.strftime(DATE_FORMAT)
+
+    if is_other.any():
+        dates = pd.to_datetime(values[is_other], errors='coerce')
+        parsed = dates.notna()
+        result[is_other] = values[is_other].astype(str)
+        result[parsed[parsed].index] = dates[parsed].dt.strftime(DATE_FORMAT)
+
+    if is_str.any():
+        text = values[is_str].str.strip()
+        result[is_str] = values[is_str]
+        unparsed = text
+        for fmt in STRING_DATE_FORMATS:
+            dates = pd.to_datetime(unparsed, format=fmt, errors='coerce')
+            ok = dates.notna()
+            result[ok[ok].index] = dates[ok].dt.strftime(DATE_FORMAT)
+            unparsed = unparsed[~ok]
+            if unparsed.empty:
+                break
+
+    return result
+
+
 def find_sheet(workbook, keywords):
     """Автоматический поиск листа по ключевым словам"""
     sheets = workbook.sheetnames
@@ -97,29 +223,178 @@ def find_sheet(workbook, keywords):
     return sheets[0]
 
 
-def safe_get(df, row, col, default=''):
-    """Безопасное чтение ячейки с дефолтным значением"""
-    try:
-        val = df.iloc[row, col]
-        if pd.isna(val) or str(val).strip() == '':
-            return default
-        return str(val).strip()
-    except Exception:
-        return default
-
-
-def safe_write(sheet, row, col, value):
-    """Безопасная запись в ячейку (обход MergedCell)"""
-    try:
-        cell = sheet.cell(row=row, column=col)
-        cell.value = value
+def rates_from_workbook(wb) -> pd.DataFrame:
+    """Лист расценок без заголовка из открытой книги (колонки 0..N, как header=None)"""
+    print(f"📋 Найдено листов: {len(wb.sheetnames)}")
+    rates_sheet = find_sheet(wb, ['справочник', 'rates', 'расцен', 'расценки'])
+    print(f"💰 Расценки: '{rates_sheet}'")
+    return pd.DataFrame(list(wb[rates_sheet].iter_rows(values_only=True)))
+
+
+class TemplateSnapshot:
+    """
+    Разобранный template.xlsx: pickle книги openpyxl
+
+    Каждый акт получает свою копию через clone() - это в разы быстрее,
+    чем заново разбирать xlsx (стили, объединения, XML листов).
+    """
+
+    def __init__(self, key: str, data: bytes, sheetnames: list):
+        self.key = key                # sha256 шаблона
+        self.data = data              # pickle книги
+        self.sheetnames = sheetnames
+
+    def clone(self):
+        return pickle.loads(self.data)
+
+    def render(self, out_path: str, edits: dict) -> list:
+        """
+        Заполнить копию шаблона и сохранить: edits = {лист: [(строка, колонка, значение)]}
+
+        Returns:
+            Пропущенные объединённые ячейки в виде "'Лист'!A1"
+        """
+        output_wb = self.clone()
+        skipped = []
+        for sheet_name, cells in edits.items():
+            writer = SheetWriter(output_wb[sheet_name], self.key)
+            for row, col, value in cells:
+                writer.write(row, col, value)
+            skipped += [f"'{sheet_name}'!{coord}" for coord in writer.skipped]
+        output_wb.save(out_path)
+        return skipped
+
+
+def template_cache_path(template_path: str) -> str:
+    """
+    Файл кэша шаблона в локальной папке пользователя (ACT_TEMPLATE_CACHE_DIR
+    или ~/.cache/severen/templates), не рядом с шаблоном
+
+    Кэш - pickle, а папка шаблона может быть общей (Dropbox): файл, который
+    туда подложил кто-то другой, не должен загружаться.
+    """
+    folder = os.getenv('ACT_TEMPLATE_CACHE_DIR') or \
+        os.path.expanduser(os.path.join('~', '.cache', 'severen', 'templates'))
+    key = hashlib.sha256(os.path.abspath(template_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(folder, f"{key}.cache")
+
+
+def load_template(template_path: str, use_cache: bool = True) -> TemplateSnapshot:
+    """
+    Шаблон акта из кэша или разбор template.xlsx с сохранением в кэш
+
+    Кэш действителен, пока совпадают mtime и размер шаблона (иначе -
+    его sha256) и версия openpyxl. Кэш - файл в папке пользователя
+    (template_cache_path, права 0600), который пишет только этот скрипт.
+    """
+    started = time.perf_counter()
+    stat = os.stat(template_path)
+    cache_path = template_cache_path(template_path)
+
+    cached = None
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('openpyxl') != openpyxl.__version__ or 'sheetnames' not in cached:
+                cached = None
+        except Exception:
+            cached = None
+
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        print(f"  ⚡ Шаблон из кэша: {time.perf_counter() - started:.2f} с")
+        return TemplateSnapshot(cached['sha256'], cached['data'], cached['sheetnames'])
+
+    with open(template_path, 'rb') as f:
+        raw = f.read()
+    sha256 = hashlib.sha256(raw).hexdigest()
+
+    if cached and cached['sha256'] == sha256:
+        # Файл тронут, но не изменён - кэш годен, обновляем mtime
+        data, sheetnames = cached['data'], cached['sheetnames']
+    else:
+        template_wb = load_workbook(BytesIO(raw))
+        data = pickle.dumps(template_wb, protocol=pickle.HIGHEST_PROTOCOL)
+        sheetnames = template_wb.sheetnames
+
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+            fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'sha256': sha256,
+                    'openpyxl': openpyxl.__version__,
+                    'sheetnames': sheetnames,
+                    'data': data,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"  ⚠️ Кэш шаблона не сохранён: {e}")
+
+    print(f"  📄 Шаблон разобран: {time.perf_counter() - started:.2f} с")
+    return TemplateSnapshot(sha256, data, sheetnames)
+
+
+def load_xml_template(template_path: str):
+    """Шаблон для движка xml: template.xlsx как zip (act_xml.py)"""
+    from act_xml import XlsxTemplate
+
+    with open(template_path, 'rb') as f:
+        raw = f.read()
+    template = XlsxTemplate(raw)
+    template.key = hashlib.sha256(raw).hexdigest()
+    return template
+
+
+# Карта объединённых ячеек шаблона: (хэш шаблона, лист) → {(строка, колонка)}
+_MERGED_CACHE = {}
+
+
+def merged_cells_map(sheet, template_key=None) -> set:
+    """
+    Ячейки листа, закрытые объединением (все, кроме левой верхней)
+
+    Для одного шаблона карта считается один раз и берётся из кэша.
+    """
+    key = (template_key, sheet.title)
+    if template_key is not None and key in _MERGED_CACHE:
+        return _MERGED_CACHE[key]
+
+    merged = set()
+    for rng in sheet.merged_cells.ranges:
+        for row in range(rng.min_row, rng.max_row + 1):
+            for col in range(rng.min_col, rng.max_col + 1):
+                if (row, col) != (rng.min_row, rng.min_col):
+                    merged.add((row, col))
+
+    if template_key is not None:
+        _MERGED_CACHE[key] = merged
+    return merged
+
+
+class SheetWriter:
+    """Запись блоков ячеек в лист шаблона в обход объединённых ячеек"""
+
+    def __init__(self, sheet, template_key=None):
+        self.sheet = sheet
+        self.merged = merged_cells_map(sheet, template_key)
+        self.skipped = []
+
+    def write(self, row: int, col: int, value):
+        """Запись одной ячейки; объединённая ячейка пропускается и учитывается"""
+        if (row, col) in self.merged:
+            self.skipped.append(self.sheet.cell(row=row, column=col).coordinate)
+            return False
+        self.sheet.cell(row=row, column=col, value=value)
         return True
-    except Exception:
-        return False
 
 
 def normalize_act_number(value) -> str:
     """Нормализация номера акта: '1' → '1', '1.0' → '1', '01-1' → '1'"""
+    if value is None:
+        return ''
     s = str(value).strip()
     if s == '' or s.lower() == 'nan':
         return ''
@@ -134,65 +409,411 @@ def normalize_act_number(value) -> str:
         return s.lstrip('0') or s
 
 
-def generate_act(data_path: str, template_path: str):
-    print("🔄 Загрузка данных...")
+def normalize_act_numbers(values: pd.Series) -> pd.Series:
+    """
+    normalize_act_number для целой колонки
 
-    # === 0. Открываем книгу с данными ===
-    data_wb = load_workbook(data_path, data_only=True)
-    sheets = data_wb.sheetnames
-    print(f"📋 Найдено листов: {len(sheets)}")
-    
-    # === 1. Параметры по умолчанию ===
-    month_name = 'январь 2026'      # можно поменять руками
-    act_date_str = ''               # пусто = возьмём дату из данных
-    status_filter = 'Выполнен'      # фильтр по статусу
+    Результат зависит только от str(значения), а разных номеров актов
+    в колонке немного: значения сводятся к уникальным строкам (factorize),
+    normalize_act_number считается один раз на каждую. Так результат
+    совпадает со скалярной версией, включая длинные числа, '1_000' и '1e3'.
+    """
+    codes, uniques = pd.factorize(values.astype(str))
+    # Последний элемент - для кода -1 (пропуски, которые новый pandas оставляет в astype(str))
+    table = np.array([normalize_act_number(value) for value in uniques] + [''], dtype=object)
+    result = pd.Series(table[codes], index=values.index, dtype=object)
+    return result.mask(values.isna(), '')
 
-    print(f"  Месяц: {month_name}")
-    print(f"  Дата акта (фикс.): {act_date_str or '— (будет рассчитана из данных)'}")
-    print(f"  Фильтр статуса: {status_filter}")
 
-    # === 2. Лист РАБОТЫ ===
-    work_sheet = find_sheet(data_wb, ['работ', 'work', 'основн', 'main'])
-    print(f"📊 Данные работ: '{work_sheet}'")
+def open_works_store(db_path: str, data_path: str):
+    """SQLite хранилище строк (works_store.py лежит в корне проекта)"""
+    try:
+        from works_store import WorksStore
+    except ImportError:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from works_store import WorksStore
+
+    store = WorksStore(db_path)
+    store.import_excel(data_path)
+    return store
+
+
+# Лист с таблицей работ и раскладка колонок по строке 13+:
+# ЗАДАНИЕ A-D (адрес, нач.дата, конц.дата, вид услуги),
+# ОТЧЕТ G-K (то же + стоимость)
+ACT_SHEET = 'Задание_Отчет_Форма_1-3'
+FIRST_DATA_ROW = 13
+ACT_COLUMNS = (1, 2, 3, 4, 7, 8, 9, 10, 11)
+
+
+def act_row_tuples(df_filtered):
+    """Кортежи значений строк акта в порядке ACT_COLUMNS"""
+    def column(name, default=''):
+        if name in df_filtered.columns:
+            return df_filtered[name]
+        return pd.Series(default, index=df_filtered.index)
+
+    # Все преобразования - по колонкам целиком, в цикле только раскладка
+    frame = pd.DataFrame({
+        'addr': column('Адрес + Задание').astype(str).str.strip(),
+        'start': format_dates(column('Начало работ')),
+        'end': format_dates(column('Конец работ')),
+        'work': column('Название работ').astype(str).str.strip(),
+        'cost': column('cost', 0.0),
+    })
+    for addr, start, end, work, cost in frame.itertuples(index=False, name=None):
+        yield (addr, start, end, work, addr, start, end, work, cost)
+
+
+# Код вида работ в начале названия: "3. Согласование..." → 3
+WORK_CODE_PATTERN = r'^\s*(\d+)\.'
+
+
+def load_rates(df_rates) -> pd.Series:
+    """Расценки: код вида работ (колонка A) → цена (колонка C)"""
+    codes = pd.to_numeric(df_rates[0], errors='coerce')
+    prices = pd.to_numeric(df_rates[2], errors='coerce')
+    valid = codes.notna() & prices.notna()
+    rates = pd.Series(prices[valid].astype(float).values, index=codes[valid].astype(int).values)
+    # При повторе кода действует последняя строка справочника (как раньше в get_cost)
+    return rates[~rates.index.duplicated(keep='last')]
+
+
+def compute_costs(df_filtered, rates: pd.Series) -> pd.Series:
+    """
+    Стоимость строк: явная 'Стоимость (руб)', иначе цена по коду вида работ
+
+    Код берётся из начала 'Название работ' одним str.extract и ищется
+    в расценках через map, без цикла по строкам и по расценкам.
+    """
+    if 'Стоимость (руб)' in df_filtered.columns:
+        explicit = pd.to_numeric(df_filtered['Стоимость (руб)'], errors='coerce')
+    else:
+        explicit = pd.Series(float('nan'), index=df_filtered.index)
 
-    df_data = pd.read_excel(data_path, sheet_name=work_sheet)
-    df_data = df_data.dropna(how='all')
-    print(f"  Загружено строк: {len(df_data)}")
+    if 'Название работ' in df_filtered.columns:
+        codes = df_filtered['Название работ'].astype(str).str.extract(WORK_CODE_PATTERN, expand=False)
+        by_rate = pd.to_numeric(codes, errors='coerce').map(rates)
+    else:
+        by_rate = pd.Series(float('nan'), index=df_filtered.index)
 
-    # === 3. БЕРЁМ НОМЕР АКТА ИЗ СТОЛБЦА A (Номер акта) ===
-    if 'Номер акта' not in df_data.columns:
-        print("❌ ОШИБКА: столбец 'Номер акта' не найден в данных")
-        raise SystemExit(1)
+    return explicit.fillna(by_rate).fillna(0.0).astype(float)
 
-    # Берём первое непустое значение из столбца "Номер акта"
-    act_numbers = df_data['Номер акта'].dropna()
-    if act_numbers.empty:
-        print("❌ ОШИБКА: в столбце 'Номер акта' нет значений")
-        raise SystemExit(1)
 
-    act_number_raw = str(act_numbers.iloc[0]).strip()
-    act_number = normalize_act_number(act_number_raw)
+def act_keys(df_data) -> pd.Series:
+    """
+    Нормализованный номер акта каждой строки
+
+    Считается один раз и кэшируется в колонке '_act' - дальше её используют
+    и список актов, и фильтр, и группировка.
+    """
+    if '_act' not in df_data.columns:
+        df_data['_act'] = normalize_act_numbers(df_data['Номер акта'])
+    return df_data['_act']
 
-    print(f"  Номер акта (из столбца A): {act_number}")
 
-    # === 4. ФИЛЬТР: статус + номер акта + даты ===
-    df_str = df_data.astype(str)
-    norm_numbers = df_str['Номер акта'].apply(normalize_act_number)
+def filter_act_rows(df_data, status_filter: str):
+    """
+    ФИЛЬТР: статус + даты, с колонкой нормализованного номера акта '_act'
+
+    Затрагивает только нужные колонки (без копии всей таблицы строками).
+    Результат группируется по '_act' один раз для всех актов.
+    """
+    keys = act_keys(df_data)
+    status = df_data['Статус'].astype('string')
 
     mask = (
-        df_str['Статус'].str.contains(status_filter, na=False, case=False) &
-        (norm_numbers == act_number) &
-        pd.notna(df_data['Начало работ']) &
-        pd.notna(df_data['Конец работ'])
+        status.str.contains(status_filter, case=False, regex=False, na=False) &
+        (keys != '') &
+        df_data['Начало работ'].notna() &
+        df_data['Конец работ'].notna()
     )
 
-    df_filtered = df_data[mask].copy()
+    return df_data[mask.astype(bool)].copy()
+
+
+def works_headers(sheet) -> list:
+    """Заголовки листа работ (строка 1) - имена колонок как у pandas"""
+    header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    return [str(h).strip() if h is not None else f'Unnamed: {i}'
+            for i, h in enumerate(header)]
+
+
+def cell_at(row, col):
+    """Значение колонки строки iter_rows (строки бывают короче заголовка)"""
+    return row[col] if col is not None and col < len(row) else None
+
+
+def stream_act_rows(wb, status_filter: str, wanted: list = None,
+                    first_act: bool = False, row_range: tuple = None):
+    """
+    Потоковое чтение листа работ с фильтром на лету
+
+    Лист читается построчно (read_only + iter_rows(values_only=True)),
+    колонки заголовка определяются один раз, и в памяти остаются только
+    строки, прошедшие фильтр статуса/дат/номера акта - как в filter_act_rows.
+
+    Args:
+        wb: Открытая read-only книга data.xlsx (закрывает вызывающий)
+        status_filter: Подстрока статуса (без учёта регистра)
+        wanted: Нормализованные номера нужных актов (None = все)
+        first_act: Взять только акт из первой непустой строки "Номер акта"
+        row_range: (первая, последняя) строки листа для чтения - из индекса актов
 
-    if df_filtered.empty:
-        print(f"❌ Нет строк для акта {act_number} со статусом '{status_filter}'")
+    Returns:
+        (df_filtered, available): строки актов с колонкой '_act',
+        номера актов просмотренных строк в порядке появления
+    """
+    started = time.perf_counter()
+    status_filter = status_filter.lower()
+    wanted = set(wanted) if wanted else None
+    first_row, last_row = row_range or (2, None)
+
+    work_sheet = find_sheet(wb, ['работ', 'work', 'основн', 'main'])
+    print(f"📊 Данные работ: '{work_sheet}' (потоковое чтение)")
+    sheet = wb[work_sheet]
+
+    headers = works_headers(sheet)
+    if 'Номер акта' not in headers:
+        print("❌ ОШИБКА: столбец 'Номер акта' не найден в данных")
+        raise SystemExit(1)
+
+    width = len(headers)
+    act_col = headers.index('Номер акта')
+    status_col = headers.index('Статус') if 'Статус' in headers else None
+    date_cols = [headers.index(name) for name in ('Начало работ', 'Конец работ')
+                 if name in headers]
+
+    available = {}
+    kept, keys = [], []
+    scanned = 0
+    for row in sheet.iter_rows(min_row=first_row, max_row=last_row, values_only=True):
+        scanned += 1
+        act = cell_at(row, act_col)
+        if act is None or act == '':
+            continue
+        act = normalize_act_number(act)
+        if not act:
+            continue
+        if act not in available:
+            available[act] = True
+            if first_act and wanted is None:
+                wanted = {act}
+        if wanted is not None and act not in wanted:
+            continue
+
+        status = cell_at(row, status_col)
+        if status is None or status_filter not in str(status).lower():
+            continue
+        if any(cell_at(row, col) in (None, '') for col in date_cols):
+            continue
+
+        kept.append(tuple(row[:width]) + (None,) * (width - len(row)))
+        keys.append(act)
+
+    df_filtered = pd.DataFrame(kept, columns=headers)
+    df_filtered['_act'] = keys
+    print(f"  Просмотрено строк: {scanned}, в актах: {len(kept)} "
+          f"({time.perf_counter() - started:.2f} с)")
+    return df_filtered, list(available)
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Версия формата индекса актов: при смене структуры старые индексы перестраиваются
+ACT_INDEX_VERSION = 2
+
+
+def act_index_path(data_path: str) -> str:
+    """Файл индекса актов рядом с данными: .data.xlsx.index (JSON)"""
+    folder, name = os.path.split(os.path.abspath(data_path))
+    return os.path.join(folder, f".{name}.index")
+
+
+def to_datetime_value(val):
+    """Дата ячейки → datetime (серийный номер Excel тоже), иначе None"""
+    if isinstance(val, datetime):
+        return val
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return datetime(1899, 12, 30) + timedelta(days=float(val))
+    return None
+
+
+def build_act_index(wb) -> dict:
+    """
+    Индекс листа работ: номер акта → статус → строки, количество, период
+
+    Один потоковый проход по листу. В 'rows' попадают только строки с обеими
+    датами - это кандидаты для акта; 'count' считает все строки статуса.
+
+    Args:
+        wb: Открытая read-only книга data.xlsx (закрывает вызывающий)
+    """
+    work_sheet = find_sheet(wb, ['работ', 'work', 'основн', 'main'])
+    sheet = wb[work_sheet]
+    headers = works_headers(sheet)
+    if 'Номер акта' not in headers:
+        print("❌ ОШИБКА: столбец 'Номер акта' не найден в данных")
         raise SystemExit(1)
 
+    act_col = headers.index('Номер акта')
+    status_col = headers.index('Статус') if 'Статус' in headers else None
+    start_col = headers.index('Начало работ') if 'Начало работ' in headers else None
+    end_col = headers.index('Конец работ') if 'Конец работ' in headers else None
+
+    acts = {}
+    for row_number, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+        act = cell_at(row, act_col)
+        if act is None or act == '':
+            continue
+        act = normalize_act_number(act)
+        if not act:
+            continue
+
+        status = cell_at(row, status_col)
+        status = '' if status is None else str(status).strip()
+        entry = acts.setdefault(act, {}).setdefault(
+            status, {'count': 0, 'rows': [], 'start': None, 'end': None})
+        entry['count'] += 1
+
+        start, end = cell_at(row, start_col), cell_at(row, end_col)
+        if start in (None, '') or end in (None, ''):
+            continue
+        entry['rows'].append(row_number)
+
+        start, end = to_datetime_value(start), to_datetime_value(end)
+        if start and (entry['start'] is None or start < entry['start']):
+            entry['start'] = start
+        if end and (entry['end'] is None or end > entry['end']):
+            entry['end'] = end
+
+    return {'version': ACT_INDEX_VERSION, 'sheet': work_sheet, 'acts': acts}
+
+
+def _index_dates(index: dict, convert) -> dict:
+    """Даты периодов индекса из файла: ISO строки → convert (datetime)"""
+    for statuses in index['acts'].values():
+        for entry in statuses.values():
+            for key in ('start', 'end'):
+                if entry[key] is not None:
+                    entry[key] = convert(entry[key])
+    return index
+
+
+def load_act_index(data_path: str, wb=None) -> dict:
+    """
+    Индекс актов из файла рядом с data.xlsx или построение заново
+
+    Индекс действителен, пока совпадают mtime и размер data.xlsx (иначе -
+    его sha256) и версия формата, как у кэша шаблона. Файл - JSON (даты
+    ISO строками): он лежит в общей папке с data.xlsx, поэтому не pickle.
+
+    Args:
+        wb: Уже открытая read-only книга data.xlsx для перестроения
+            (None - открыть, только если индекс устарел)
+    """
+    started = time.perf_counter()
+    stat = os.stat(data_path)
+    index_path = act_index_path(data_path)
+
+    cached = None
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            if not isinstance(cached, dict) or cached.get('version') != ACT_INDEX_VERSION:
+                cached = None
+            else:
+                cached = _index_dates(cached, datetime.fromisoformat)
+        except Exception:
+            cached = None
+
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        print(f"  ⚡ Индекс актов из кэша: {len(cached['acts'])} акт(ов), "
+              f"{time.perf_counter() - started:.2f} с")
+        return cached
+
+    sha256 = file_sha256(data_path)
+
+    if cached and cached['sha256'] == sha256:
+        # Файл тронут, но не изменён - индекс годен, обновляем mtime
+        index = cached
+        action = 'проверен по sha256'
+    else:
+        if wb is not None:
+            index = build_act_index(wb)
+        else:
+            wb = load_workbook(data_path, read_only=True, data_only=True)
+            try:
+                index = build_act_index(wb)
+            finally:
+                wb.close()
+        index['sha256'] = sha256
+        action = 'построен'
+    index.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    try:
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, default=datetime.isoformat)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError as e:
+        print(f"  ⚠️ Индекс актов не сохранён: {e}")
+
+    print(f"  🗂️ Индекс актов {action}: {len(index['acts'])} акт(ов), "
+          f"{time.perf_counter() - started:.2f} с")
+    return index
+
+
+def indexed_act(index: dict, act_number: str, status_filter: str) -> dict:
+    """
+    Сводка акта по индексу, без чтения строк
+
+    Returns:
+        {'rows': номера строк листа, 'count': строк по фильтру,
+         'start': начало периода, 'end': конец периода, 'statuses': {статус: строк}}
+    """
+    statuses = index['acts'].get(act_number, {})
+    status_filter = status_filter.lower()
+    matched = [entry for status, entry in statuses.items() if status_filter in status.lower()]
+
+    starts = [entry['start'] for entry in matched if entry['start']]
+    ends = [entry['end'] for entry in matched if entry['end']]
+    rows = sorted(row for entry in matched for row in entry['rows'])
+    return {
+        'rows': rows,
+        'count': len(rows),
+        'start': min(starts) if starts else None,
+        'end': max(ends) if ends else None,
+        'statuses': {status: entry['count'] for status, entry in statuses.items()},
+    }
+
+
+def render_act(df_filtered, act_number: str, rates: pd.Series, template,
+               out_name: str, act_date_str: str = '') -> dict:
+    """
+    Расчёт и заполнение одного акта по уже отфильтрованным строкам
+
+    Args:
+        df_filtered: Строки акта
+        act_number: Нормализованный номер акта
+        rates: Расценки (код → цена)
+        template: Шаблон: TemplateSnapshot (openpyxl) или XlsxTemplate (xml)
+        out_name: Имя выходного файла
+        act_date_str: Фиксированная дата акта ('' = из данных)
+
+    Returns:
+        Итоги акта: номер, файл, число строк, сумма
+    """
+    df_filtered = df_filtered.copy()
     num_rows = len(df_filtered)
+    print(f"\n📄 Акт № {act_number}")
     print(f"  Отфильтровано строк: {num_rows}")
 
     # === 5. Период по датам ===
@@ -200,34 +821,8 @@ def generate_act(data_path: str, template_path: str):
     end_date = to_date(df_filtered['Конец работ'].max())
     print(f"  Период работ: {start_date} - {end_date}")
 
-    # === 6. РАСЦЕНКИ ===
-    rates_sheet = find_sheet(data_wb, ['справочник', 'rates', 'расцен', 'расценки'])
-    print(f"💰 Расценки: '{rates_sheet}'")
-    df_rates = pd.read_excel(data_path, sheet_name=rates_sheet, header=None)
-
-    rates_dict = {}
-    for _, row in df_rates.iterrows():
-        if pd.notna(row[0]) and pd.notna(row[2]):
-            try:
-                rates_dict[int(row[0])] = float(row[2])
-            except Exception:
-                continue
-    print(f"  Найдено расценок: {len(rates_dict)}")
-
     # === 7. РАСЧЁТ СТОИМОСТИ ===
-    def get_cost(row):
-        if pd.notna(row.get('Стоимость (руб)', pd.NA)):
-            try:
-                return float(row['Стоимость (руб)'])
-            except Exception:
-                pass
-        desc = str(row.get('Название работ', ''))
-        for code, price in rates_dict.items():
-            if f"{code}." in desc:
-                return price
-        return 0.0
-
-    df_filtered['cost'] = df_filtered.apply(get_cost, axis=1)
+    df_filtered['cost'] = compute_costs(df_filtered, rates)
     total_sum = df_filtered['cost'].sum()
     total_formatted = sum_to_words(total_sum)
 
@@ -245,45 +840,20 @@ def generate_act(data_path: str, template_path: str):
 
     # === 9. ЗАПОЛНЕНИЕ ШАБЛОНА ===
     print("📄 Заполнение шаблона...")
-    output_wb = load_workbook(template_path)
+    edits = {}
 
     # --- ШАПКА: Номер акта в C5 ---
-    for sheet_name in output_wb.sheetnames:
-        sheet = output_wb[sheet_name]
+    for sheet_name in template.sheetnames:
         # Пишем номер акта в C5 везде (можно ограничить нужным листом)
-        safe_write(sheet, 5, 3, f"№ {act_number}")
-        print(f"  Номер акта в C5 листа '{sheet_name}': № {act_number}")
+        edits[sheet_name] = [(5, 3, f"№ {act_number}")]
 
     # --- Лист: Задание_Отчет_Форма_1-3 (ТАБЛИЦА ДАННЫХ) ---
-    if 'Задание_Отчет_Форма_1-3' in output_wb.sheetnames:
-        sheet13 = output_wb['Задание_Отчет_Форма_1-3']
-
-        FIRST_DATA_ROW = 13
-
-        # === ЗАПОЛНЕНИЕ ДАННЫХ ===
-        for idx, (_, row) in enumerate(df_filtered.iterrows()):
-            r = FIRST_DATA_ROW + idx
-
-            addr = str(row.get('Адрес + Задание', '')).strip()
-            start_work = to_date(row.get('Начало работ', ''))
-            end_work = to_date(row.get('Конец работ', ''))
-            work_name = str(row.get('Название работ', '')).strip()
-            cost = row.get('cost', 0.0)
-
-            # Левая часть (ЗАДАНИЕ): A, B, C, D
-            safe_write(sheet13, r, 1, addr)         # A: адрес
-            safe_write(sheet13, r, 2, start_work)   # B: дата передачи задания
-            safe_write(sheet13, r, 3, end_work)     # C: дата выполнения задания
-            safe_write(sheet13, r, 4, work_name)    # D: вид оказанной услуги
-
-            # Правая часть (ОТЧЕТ): G, H, I, J, K
-            safe_write(sheet13, r, 7, addr)         # G: адрес
-            safe_write(sheet13, r, 8, start_work)   # H: дата передачи задания
-            safe_write(sheet13, r, 9, end_work)     # I: дата выполнения задания
-            safe_write(sheet13, r, 10, work_name)   # J: вид оказанной услуги
-            safe_write(sheet13, r, 11, cost)        # K: стоимость
+    if ACT_SHEET in template.sheetnames:
+        cells = edits[ACT_SHEET]
 
-        print(f"  ✏️ Заполнены {num_rows} строк(и) таблицы")
+        # === ЗАПОЛНЕНИЕ ДАННЫХ (A-D: ЗАДАНИЕ, G-K: ОТЧЕТ) ===
+        for r, values in enumerate(act_row_tuples(df_filtered), start=FIRST_DATA_ROW):
+            cells.extend((r, col, value) for col, value in zip(ACT_COLUMNS, values))
 
         # === СУММА (ДИНАМИЧЕСКАЯ) ===
         new_last_data_row = FIRST_DATA_ROW + num_rows - 1
@@ -292,37 +862,483 @@ def generate_act(data_path: str, template_path: str):
 
         # K_SUM_ROW: динамическая сумма (считает всё выше себя)
         sum_formula = f'=СУММ(K$13:СМЕЩ(K{K_SUM_ROW};-1;0))'
-        safe_write(sheet13, K_SUM_ROW, 11, sum_formula)
-        print(f"  🔢 K{K_SUM_ROW} = {sum_formula}")
+        cells.append((K_SUM_ROW, 11, sum_formula))
 
         # J_TEXT_ROW: текст суммы прописью
-        safe_write(sheet13, J_TEXT_ROW, 10, total_formatted)
-        print(f"  📝 J{J_TEXT_ROW} = {total_formatted}")
+        cells.append((J_TEXT_ROW, 10, total_formatted))
+    else:
+        print(f"  ⚠️ Лист '{ACT_SHEET}' не найден")
 
+    # === 10. СОХРАНЕНИЕ ===
+    skipped = template.render(out_name, edits)
+
+    for sheet_name in template.sheetnames:
+        if f"'{sheet_name}'!C5" not in skipped:
+            print(f"  Номер акта в C5 листа '{sheet_name}': № {act_number}")
+    if ACT_SHEET in template.sheetnames:
+        print(f"  ✏️ Заполнены {num_rows} строк(и) таблицы")
+        print(f"  🔢 K{K_SUM_ROW} = {sum_formula}")
+        print(f"  📝 J{J_TEXT_ROW} = {total_formatted}")
         print(f"  ✅ Задание_Отчет_Форма_1-3: готово!")
+    if skipped:
+        print(f"  ⚠️ Пропущено объединённых ячеек: {len(skipped)} ({', '.join(skipped[:10])})")
+    print(f"📁 Файл: {out_name}")
+
+    return {
+        'act_number': act_number,
+        'file': out_name,
+        'rows': num_rows,
+        'total': total_sum,
+        'total_formatted': total_formatted,
+    }
+
+
+def render_act_timed(*args) -> dict:
+    """render_act + время заполнения акта (для пула процессов)"""
+    started = time.perf_counter()
+    result = render_act(*args)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def frames_from_workbook(wb):
+    """
+    Лист работ и расценки из уже открытой книги openpyxl
+
+    Для full_sync: книга после синхронизации и сортировки уже в памяти,
+    data.xlsx повторно не читается.
+
+    Такая книга открыта без data_only, и в 'Стоимость (руб)' вместо
+    значений лежат формулы (=VLOOKUP(F<строка>, Справочник_Работы...)).
+    Они заменяются на None: стоимость этих строк compute_costs берёт из
+    расценок по коду вида работ - это та же цена, что даёт VLOOKUP.
+    Так же выходит и при data_only: в файле, сохранённом openpyxl,
+    кэшированных значений формул нет.
+
+    Returns:
+        (df_data, df_rates): лист работ, лист расценок без заголовка
+    """
+    sheet = wb[find_sheet(wb, ['работ', 'work', 'основн', 'main'])]
+    headers = works_headers(sheet)
+    width = len(headers)
+    rows = [tuple(row[:width]) + (None,) * (width - len(row))
+            for row in sheet.iter_rows(min_row=2, values_only=True)
+            if any(value is not None for value in row)]
+    if 'Стоимость (руб)' in headers:
+        cost = headers.index('Стоимость (руб)')
+        rows = [row[:cost] + (None,) + row[cost + 1:]
+                if isinstance(row[cost], str) and row[cost].startswith('=') else row
+                for row in rows]
+    df_data = pd.DataFrame(rows, columns=headers)
+
+    return df_data, rates_from_workbook(wb)
+
+
+# Колонки, от которых зависит содержимое акта
+ACT_SOURCE_COLUMNS = ('Адрес + Задание', 'Начало работ', 'Конец работ',
+                      'Название работ', 'Стоимость (руб)', 'Дата')
+
+
+def act_digest(rows) -> str:
+    """Отпечаток строк акта: sha256 колонок ACT_SOURCE_COLUMNS"""
+    columns = [column for column in ACT_SOURCE_COLUMNS if column in rows.columns]
+    payload = rows[columns].astype(str).to_csv(index=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Версия генератора: менять при любом изменении содержимого актов
+# (раскладка, формулы, пропись) - все акты станут неактуальными
+GENERATOR_VERSION = '2026.10-2'
+
+# Манифест актов рядом с готовыми файлами
+ACTS_MANIFEST = '.acts_manifest.json'
+
+
+def rates_digest(rates: pd.Series) -> str:
+    """Отпечаток расценок (код → цена)"""
+    payload = repr(sorted((int(code), float(price)) for code, price in rates.items()))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def act_fingerprint(rows, rates_key: str, template_key: str, act_date_str: str = '',
+                    engine: str = '') -> str:
+    """
+    Отпечаток акта: его строки + расценки + шаблон + движок + версия генератора
+
+    Акт перегенерируется, только если изменилось что-то из этого.
+    """
+    parts = (act_digest(rows), rates_key, template_key, act_date_str, engine, GENERATOR_VERSION)
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """Манифест актов: номер акта → {'fingerprint', 'file', ...}"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️ Манифест актов не прочитан, все акты будут перегенерированы: {e}")
+        return {}
+    return manifest.get('acts', {}) if isinstance(manifest, dict) else {}
+
+
+def save_manifest(path: str, acts: dict):
+    """Сохранение манифеста актов (через временный файл)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'generator': GENERATOR_VERSION, 'acts': acts}, f,
+                  ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(manifest: dict, act_number: str, fingerprint: str, out_dir: str = '') -> bool:
+    """Акт актуален: отпечаток совпадает и файл акта на месте"""
+    entry = manifest.get(act_number)
+    return bool(entry) and entry.get('fingerprint') == fingerprint and \
+        os.path.exists(os.path.join(out_dir, entry.get('file', '')))
+
+
+def render_changed_acts(df_data, df_rates, template_path: str, out_dir: str,
+                        manifest: dict = None, status_filter: str = 'Выполнен',
+                        engine: str = 'xml'):
+    """
+    Генерация только тех актов, отпечаток которых изменился
+
+    Args:
+        df_data: Лист работ
+        df_rates: Лист расценок без заголовка
+        template_path: Шаблон акта (template.xlsx)
+        out_dir: Папка актов; имена файлов постоянные - Акт_№N.xlsx
+        manifest: Манифест с прошлого запуска (load_manifest)
+        status_filter: Фильтр по статусу
+        engine: Движок заполнения ('xml' или 'openpyxl')
+
+    Returns:
+        (results, manifest): итоги перегенерированных актов, манифест всех актов
+    """
+    manifest = manifest or {}
+    if 'Номер акта' not in df_data.columns:
+        print("❌ ОШИБКА: столбец 'Номер акта' не найден в данных")
+        return [], manifest
+
+    df_filtered = filter_act_rows(df_data, status_filter)
+    rates = load_rates(df_rates)
+    rates_key = rates_digest(rates)
+    template_key = file_sha256(template_path)
+    template = None
+    results = []
+    current = {}
+
+    for act_number, rows in df_filtered.groupby('_act', sort=False):
+        fingerprint = act_fingerprint(rows, rates_key, template_key, engine=engine)
+        out_name = f"Акт_№{act_number}.xlsx"
+        current[act_number] = {'fingerprint': fingerprint, 'file': out_name}
+        if is_up_to_date(manifest, act_number, fingerprint, out_dir):
+            continue
+
+        # Шаблон - только если есть что перегенерировать
+        if template is None:
+            if engine == 'xml':
+                template = load_xml_template(template_path)
+            else:
+                template = load_template(template_path)
+        results.append(render_act_timed(rows, act_number, rates, template,
+                                        os.path.join(out_dir, out_name)))
+
+    print(f"  📋 Актов: {len(current)}, перегенерировано: {len(results)}, "
+          f"без изменений: {len(current) - len(results)}")
+    return results, current
+
+
+def select_act_rows(wb, data_path: str, db_path: str, act_numbers: list, all_acts: bool,
+                    status_filter: str, use_index: bool):
+    """
+    Номера актов и их строки: из хранилища, по индексу или потоковым чтением
+
+    Args:
+        wb: Открытая read-only книга data.xlsx (общая для индекса и чтения строк)
+
+    Returns:
+        (wanted, df_filtered): номера актов, строки актов с колонкой '_act'
+    """
+    batch = bool(act_numbers) or all_acts
+
+    # === 2-3. Лист РАБОТЫ + НОМЕР АКТА ИЗ СТОЛБЦА A (Номер акта) ===
+    if db_path:
+        store = open_works_store(db_path, data_path)
+        print(f"📊 Данные работ: хранилище '{db_path}' ({store.count()} строк)")
+
+        # Номера актов в порядке листа, строки актов - по индексу
+        available = store.act_numbers()
+        if not available:
+            print("❌ ОШИБКА: в столбце 'Номер акта' нет значений")
+            raise SystemExit(1)
+
+        if act_numbers:
+            wanted = [normalize_act_number(a) for a in act_numbers]
+        elif all_acts:
+            wanted = available
+        else:
+            wanted = available[:1]
+
+        df_data = pd.DataFrame(
+            [row for act in wanted for row in store.act_rows(act, status_filter)],
+            columns=store.headers
+        )
+        store.close()
+        print(f"  Загружено строк актов: {len(df_data)}")
+
+        # === 4. ФИЛЬТР ===
+        df_filtered = filter_act_rows(df_data, status_filter)
+    elif use_index:
+        # Выбор актов и их строки - по индексу, лист читается только в их диапазоне
+        index = load_act_index(data_path, wb)
+        available = list(index['acts'])
+        if not available:
+            print("❌ ОШИБКА: в столбце 'Номер акта' нет значений")
+            raise SystemExit(1)
+
+        if act_numbers:
+            wanted = [normalize_act_number(a) for a in act_numbers]
+        elif all_acts:
+            wanted = available
+        else:
+            # Берём первое непустое значение из столбца "Номер акта"
+            wanted = available[:1]
+
+        positions = [row for act in wanted
+                     for row in indexed_act(index, act, status_filter)['rows']]
+        if positions:
+            # === 4. ФИЛЬТР ПРИ ЧТЕНИИ ===
+            df_filtered, _ = stream_act_rows(wb, status_filter, wanted,
+                                             row_range=(min(positions), max(positions)))
+        else:
+            df_filtered = pd.DataFrame(columns=['_act'])
     else:
-        print("  ⚠️ Лист 'Задание_Отчет_Форма_1-3' не найден")
+        # === 4. ФИЛЬТР ПРИ ЧТЕНИИ: в памяти только строки нужных актов ===
+        wanted = [normalize_act_number(a) for a in act_numbers] if act_numbers else None
+        # Без номеров и --all берём первое непустое значение из столбца "Номер акта"
+        df_filtered, available = stream_act_rows(wb, status_filter, wanted,
+                                                 first_act=not batch)
+        if not available:
+            print("❌ ОШИБКА: в столбце 'Номер акта' нет значений")
+            raise SystemExit(1)
+
+        if not wanted:
+            wanted = available if all_acts else available[:1]
+
+    return wanted, df_filtered
+
+
+def generate_act(data_path: str, template_path: str, db_path: str = None,
+                 act_numbers: list = None, all_acts: bool = False, jobs: int = 1,
+                 use_cache: bool = True, engine: str = 'openpyxl',
+                 use_index: bool = True, force: bool = False, out_dir: str = '') -> list:
+    """
+    Генерация актов
+
+    Args:
+        data_path: Файл данных (data.xlsx)
+        template_path: Шаблон акта (template.xlsx)
+        db_path: SQLite хранилище строк (необязательно)
+        act_numbers: Номера актов для пакетной генерации
+        all_acts: Сгенерировать все акты из данных
+        jobs: Число процессов для заполнения актов (1 = последовательно)
+        use_cache: Брать разобранный шаблон из кэша пользователя
+            (ACT_TEMPLATE_CACHE_DIR или ~/.cache/severen/templates)
+        engine: 'openpyxl' - объектная модель openpyxl, 'xml' - патч XML шаблона
+        use_index: Выбирать акты и их строки по индексу рядом с data.xlsx
+        force: Пересобрать все акты, даже актуальные по манифесту
+        out_dir: Папка готовых актов и манифеста (пусто = текущая)
+
+    Без act_numbers и all_acts генерируется один акт - по первому
+    непустому значению в столбце "Номер акта". В пакетном режиме акты,
+    отпечаток которых (строки, расценки, шаблон, версия генератора) совпадает
+    с манифестом out_dir/.acts_manifest.json, не перегенерируются.
+
+    Returns:
+        Список итогов по каждому акту
+    """
+    print("🔄 Загрузка данных...")
 
-    # === 10. СОХРАНЕНИЕ ===
+    # === 1. Параметры по умолчанию ===
+    month_name = 'январь 2026'      # можно поменять руками
+    act_date_str = ''               # пусто = возьмём дату из данных
+    status_filter = 'Выполнен'      # фильтр по статусу
+    batch = bool(act_numbers) or all_acts
+
+    print(f"  Месяц: {month_name}")
+    print(f"  Дата акта (фикс.): {act_date_str or '— (будет рассчитана из данных)'}")
+    print(f"  Фильтр статуса: {status_filter}")
+
+    # === 2-4. Лист РАБОТЫ + НОМЕР АКТА ИЗ СТОЛБЦА A, ФИЛЬТР ===
+    # data.xlsx открывается один раз: расценки, индекс и строки актов - из одной книги
+    wb = load_workbook(data_path, read_only=True, data_only=True)
+    try:
+        df_rates = rates_from_workbook(wb)
+        wanted, df_filtered = select_act_rows(wb, data_path, db_path, act_numbers, all_acts,
+                                              status_filter, use_index)
+    finally:
+        wb.close()
+
+    print(f"  Номера актов (из столбца A): {', '.join(wanted)}")
+
+    # === ГРУППИРОВКА ПО НОМЕРУ АКТА (один проход) ===
+    groups = {act: rows for act, rows in df_filtered.groupby('_act', sort=False)}
+
+    # === 6. РАСЦЕНКИ ===
+    rates = load_rates(df_rates)
+    print(f"  Найдено расценок: {len(rates)}")
+
+    # Пакетный режим пересобирает только акты с изменившимся отпечатком
+    incremental = batch and not force
+    manifest_path = os.path.join(out_dir, ACTS_MANIFEST)
+    manifest = load_manifest(manifest_path) if batch else {}
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if batch:
+        rates_key = rates_digest(rates)
+        template_key = file_sha256(template_path)
+
+    # === 9-10. ЗАПОЛНЕНИЕ И СОХРАНЕНИЕ АКТОВ ===
     now_str = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    out_name = f"Готовый_Акт_{month_name}_{now_str}.xlsx"
-    output_wb.save(out_name)
+    pending = []
+    up_to_date = []
+    fingerprints = {}
+    for act_number in wanted:
+        rows = groups.get(act_number)
+        if rows is None or rows.empty:
+            print(f"❌ Нет строк для акта {act_number} со статусом '{status_filter}'")
+            if not batch:
+                raise SystemExit(1)
+            continue
+
+        if batch:
+            fingerprints[act_number] = act_fingerprint(rows, rates_key, template_key, act_date_str,
+                                                       engine)
+            if incremental and is_up_to_date(manifest, act_number, fingerprints[act_number],
+                                             out_dir):
+                up_to_date.append(act_number)
+                continue
+            out_name = f"Готовый_Акт_№{act_number}_{month_name}_{now_str}.xlsx"
+        else:
+            out_name = f"Готовый_Акт_{month_name}_{now_str}.xlsx"
+
+        pending.append((rows, act_number, os.path.join(out_dir, out_name)))
+
+    for act_number in up_to_date:
+        print(f"✔️ Акт № {act_number} актуален: {manifest[act_number]['file']}")
+
+    if not pending:
+        if up_to_date:
+            print("\n✅ Все акты актуальны, перегенерация не нужна (--force - пересобрать)")
+            return []
+        print("❌ Ни один акт не сгенерирован")
+        raise SystemExit(1)
+
+    # Шаблон разбирается один раз (или берётся из кэша),
+    # каждый акт заполняет свою чистую копию
+    if engine == 'xml':
+        template = load_xml_template(template_path)
+    else:
+        template = load_template(template_path, use_cache)
+
+    # Каждому акту - только его строки и снимок шаблона
+    tasks = [(rows, act_number, rates, template, out_name, act_date_str)
+             for rows, act_number, out_name in pending]
+
+    started = time.perf_counter()
+    if jobs > 1 and len(tasks) > 1:
+        print(f"\n⚙️ Параллельное заполнение: {len(tasks)} актов, процессов: {jobs}")
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(render_act_timed, *task) for task in tasks]
+            results = [future.result() for future in futures]
+    else:
+        results = [render_act_timed(*task) for task in tasks]
+    elapsed = time.perf_counter() - started
 
     print("\n🎉 ГОТОВО!")
-    print(f"📁 Файл: {out_name}")
-    print(f"📋 Номер акта: {act_number}")
-    print(f"💰 Итого: {total_formatted}")
-    print(f"📈 Работ: {num_rows} шт.")
+    for result in results:
+        print(f"📁 Файл: {result['file']}")
+        print(f"📋 Номер акта: {result['act_number']}")
+        print(f"💰 Итого: {result['total_formatted']}")
+        print(f"📈 Работ: {result['rows']} шт.")
+
+    print("\n📊 ИТОГИ ПО АКТАМ:")
+    for result in results:
+        print(f"  № {result['act_number']:>6}: {result['rows']:>4} строк  "
+              f"{result['total']:>14,.2f} руб.  {result['seconds']:.2f} с")
+    total = sum(result['total'] for result in results)
+    print(f"  Всего: {len(results)} акт(ов), {total:,.2f} руб., "
+          f"{elapsed:.2f} с (процессов: {max(jobs, 1)})")
+    if up_to_date:
+        print(f"  Актуальны без перегенерации: {', '.join(up_to_date)}")
+
+    if batch:
+        for result in results:
+            manifest[result['act_number']] = {
+                'fingerprint': fingerprints[result['act_number']],
+                'file': os.path.basename(result['file']),
+                'rows': result['rows'],
+                'total': result['total'],
+            }
+        save_manifest(manifest_path, manifest)
+
+    return results
+
+
+def list_acts(data_path: str, status_filter: str = 'Выполнен'):
+    """Список актов с количеством строк и периодом - только по индексу"""
+    index = load_act_index(data_path)
+    print(f"\n📋 АКТЫ В ДАННЫХ (фильтр статуса: {status_filter}):")
+    for act in index['acts']:
+        summary = indexed_act(index, act, status_filter)
+        period = '—'
+        if summary['start'] and summary['end']:
+            period = f"{to_date(summary['start'])} - {to_date(summary['end'])}"
+        statuses = ', '.join(f"{status or '(пусто)'}: {count}"
+                             for status, count in summary['statuses'].items())
+        print(f"  № {act:>6}: {summary['count']:>4} строк  {period}  [{statuses}]")
+
+
+def parse_act_list(value: str) -> list:
+    """'1, 2,5' → ['1', '2', '5']"""
+    return [part.strip() for part in value.split(',') if part.strip()]
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Генерация акта СМР Северен-Телеком")
     parser.add_argument('--data', required=True, help='Файл данных (*.xlsx)')
-    parser.add_argument('--template', required=True, help='Шаблон акта (*.xlsx)')
+    parser.add_argument('--template', help='Шаблон акта (*.xlsx), не нужен для --list')
+    parser.add_argument('--db', help='SQLite хранилище строк (works_store.py), необязательно')
+    parser.add_argument('--all', action='store_true', help='Сгенерировать все акты за один запуск')
+    parser.add_argument('--acts', type=parse_act_list, help='Номера актов через запятую: 1,2,5')
+    parser.add_argument('--jobs', type=int, default=1, help='Число процессов для заполнения актов')
+    parser.add_argument('--no-template-cache', action='store_true',
+                        help='Не использовать кэш разобранного шаблона')
+    parser.add_argument('--engine', choices=['openpyxl', 'xml'], default='openpyxl',
+                        help='Движок заполнения: openpyxl или xml (патч XML шаблона, быстрее)')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Не использовать индекс актов, просматривать весь лист')
+    parser.add_argument('--force', action='store_true',
+                        help='Пересобрать все акты, даже актуальные по манифесту')
+    parser.add_argument('--out-dir', default='',
+                        help='Папка готовых актов и манифеста (по умолчанию текущая)')
+    parser.add_argument('--list', action='store_true',
+                        help='Только показать акты из индекса (строки, период, статусы)')
     args = parser.parse_args()
+    if not args.list and not args.template:
+        parser.error('нужен --template')
 
     try:
-        generate_act(args.data, args.template)
+        if args.list:
+            list_acts(args.data)
+        else:
+            generate_act(args.data, args.template, args.db, args.acts, args.all, args.jobs,
+                         use_cache=not args.no_template_cache, engine=args.engine,
+                         use_index=not args.no_index, force=args.force, out_dir=args.out_dir)
     except Exception as e:
         print(f"\n❌ ОШИБКА: {e}")
         import traceback
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+works_store.py - Локальное SQLite-хранилище строк листа "Работы"
+
+Хранилище собирается из data.xlsx и служит основным источником данных
+для синхронизации: поиск по номеру работы, выборка строк акта и сортировка
+выполняются индексированными запросами, а data.xlsx перерисовывается
+из хранилища один раз в конце.
+
+ИСПОЛЬЗОВАНИЕ:
+    python works_store.py --db data/works.sqlite --file data.xlsx           # импорт
+    python works_store.py --db data/works.sqlite --file data.xlsx --render  # выгрузка
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+from copy import copy
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import openpyxl
+from dateutil import parser as date_parser
+from openpyxl.formula.translate import Translator, TranslatorError
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = 'Работы'
+NUM_COLUMNS = 14
+
+# Колонки листа "Работы" (1-based), по которым строятся индексы
+COL_ACT_NUMBER = 1   # A: Номер акта
+COL_ADDRESS = 3      # C: Адрес + Задание
+COL_START_DATE = 4   # D: Начало работ
+COL_STATUS = 11      # K: Статус
+
+WORK_NUMBER_PATTERN = re.compile(r'Задание\s*[№#]?\s*(\d+)', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    row_id      INTEGER PRIMARY KEY,  -- номер строки в листе (2..N)
+    work_number TEXT,
+    act_number  TEXT,
+    status      TEXT,                 -- в нижнем регистре, для фильтра
+    start_date  TEXT,                 -- ISO, для сортировки
+    address     TEXT,
+    cells       TEXT NOT NULL         -- JSON: значения колонок A..N
+);
+CREATE INDEX IF NOT EXISTS idx_works_work_number ON works(work_number);
+CREATE INDEX IF NOT EXISTS idx_works_act_number ON works(act_number);
+CREATE INDEX IF NOT EXISTS idx_works_status ON works(status);
+CREATE INDEX IF NOT EXISTS idx_works_start_date ON works(start_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_act_number(value) -> str:
+    """Нормализация номера акта (как в generate_act.normalize_act_number)"""
+    if value is None:
+        return ''
+    s = str(value).strip()
+    if s == '' or s.lower() == 'nan':
+        return ''
+
+    if '-' in s:
+        s = s.split('-')[-1]
+
+    try:
+        return str(int(float(s)))
+    except Exception:
+        return s.lstrip('0') or s
+
+
+def normalize_date(value) -> Optional[datetime]:
+    """Любое значение даты → datetime или None (как в full_sync.sort_excel_by_date)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return date_parser.parse(value, dayfirst=True)
+        except Exception:
+            return None
+    return None
+
+
+def extract_work_number(address) -> str:
+    """Номер работы из колонки C ("... Задание 12345")"""
+    if not address:
+        return ''
+    match = WORK_NUMBER_PATTERN.search(str(address))
+    return match.group(1) if match else ''
+
+
+def _encode_value(value):
+    """Значение ячейки → JSON-совместимое"""
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _move_formula(value, row_from: int, row_to: int):
+    """
+    Формула строки row_from, перенесённая в строку row_to
+
+    Относительные ссылки сдвигаются вместе со строкой. Если ссылка уходит
+    выше первой строки (формула уже указывала не на свою строку),
+    формула остаётся как была.
+    """
+    if not isinstance(value, str) or not value.startswith('=') or row_from == row_to:
+        return value
+    try:
+        return Translator(value, origin=f"A{row_from}").translate_formula(f"A{row_to}")
+    except TranslatorError:
+        logger.warning(f"⚠️ Формула строки {row_from} не сдвинута в строку {row_to}: {value}")
+        return value
+
+
+def _decode_value(value):
+    """JSON-значение → значение ячейки"""
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+class _StoreCell:
+    """Ячейка строки хранилища (интерфейс openpyxl: .value)"""
+
+    def __init__(self, values: List, col: int, on_change):
+        self._values = values
+        self._col = col
+        self._on_change = on_change
+
+    @property
+    def value(self):
+        return self._values[self._col - 1]
+
+    @value.setter
+    def value(self, new_value):
+        self._values[self._col - 1] = new_value
+        self._on_change()
+
+
+class WorksSheet:
+    """
+    Лист "Работы" поверх хранилища
+
+    Повторяет ту часть интерфейса openpyxl Worksheet, которой пользуется
+    ExcelManager (cell, max_row, title). Строки подгружаются из SQLite
+    по требованию, изменённые записываются через flush().
+    """
+
+    def __init__(self, store: 'WorksStore'):
+        self.store = store
+        self.title = SHEET_NAME
+        self._rows: Dict[int, List] = {}
+        self._dirty = set()
+        self._max_row = store.max_row()
+
+    @property
+    def max_row(self) -> int:
+        return self._max_row
+
+    def _row(self, row: int) -> List:
+        if row not in self._rows:
+            values = self.store.get_row(row)
+            self._rows[row] = values if values is not None else [None] * NUM_COLUMNS
+        return self._rows[row]
+
+    def cell(self, row: int, column: int) -> _StoreCell:
+        values = self._row(row)
+
+        def mark_dirty():
+            self._dirty.add(row)
+            self._max_row = max(self._max_row, row)
+
+        return _StoreCell(values, column, mark_dirty)
+
+    def flush(self):
+        """Запись изменённых строк в SQLite"""
+        if not self._dirty:
+            return
+        self.store.put_rows({row: self._rows[row] for row in self._dirty})
+        self._dirty.clear()
+
+
+class WorksStore:
+    """SQLite-хранилище строк листа "Работы" с индексами"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        self._sheet = None
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    # --- meta ---
+
+    def get_meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    @property
+    def headers(self) -> List[str]:
+        """Заголовки колонок A..N из data.xlsx"""
+        raw = self.get_meta('headers')
+        return json.loads(raw) if raw else [f'col_{i}' for i in range(1, NUM_COLUMNS + 1)]
+
+    # --- строки ---
+
+    def _index_fields(self, values: List) -> tuple:
+        start = normalize_date(values[COL_START_DATE - 1])
+        status = values[COL_STATUS - 1]
+        address = values[COL_ADDRESS - 1]
+        return (
+            extract_work_number(address),
+            normalize_act_number(values[COL_ACT_NUMBER - 1]),
+            str(status).lower() if status is not None else '',
+            start.isoformat() if start else None,
+            str(address) if address is not None else '',
+        )
+
+    def put_rows(self, rows: Dict[int, List]):
+        """Запись строк {номер_строки: значения A..N} с пересчётом индексов"""
+        self.conn.executemany(
+            """INSERT OR REPLACE INTO works
+               (row_id, work_number, act_number, status, start_date, address, cells)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (row, *self._index_fields(values),
+                 json.dumps([_encode_value(v) for v in values], ensure_ascii=False))
+                for row, values in rows.items()
+            ]
+        )
+
+    def get_row(self, row: int) -> Optional[List]:
+        result = self.conn.execute("SELECT cells FROM works WHERE row_id = ?", (row,)).fetchone()
+        if result is None:
+            return None
+        return [_decode_value(v) for v in json.loads(result[0])]
+
+    def max_row(self) -> int:
+        """Последняя занятая строка листа (1 = только заголовок)"""
+        result = self.conn.execute("SELECT MAX(row_id) FROM works").fetchone()[0]
+        return result or 1
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+
+    def sheet(self) -> WorksSheet:
+        """Лист поверх хранилища для ExcelManager"""
+        if self._sheet is None:
+            self._sheet = WorksSheet(self)
+        return self._sheet
+
+    def find_row(self, work_number: str) -> Optional[int]:
+        """
+        Найти строку по номеру работы
+
+        Сначала точное совпадение по индексу work_number, затем (для строк,
+        заполненных вручную в другом формате) поиск подстроки в адресе.
+        """
+        if not work_number:
+            return None
+        if self._sheet is not None:
+            self._sheet.flush()
+
+        result = self.conn.execute(
+            "SELECT row_id FROM works WHERE work_number = ? ORDER BY row_id LIMIT 1",
+            (work_number,)
+        ).fetchone()
+        if result is None:
+            result = self.conn.execute(
+                "SELECT row_id FROM works WHERE instr(address, ?) > 0 ORDER BY row_id LIMIT 1",
+                (work_number,)
+            ).fetchone()
+        return result[0] if result else None
+
+    def act_numbers(self) -> List[str]:
+        """Номера актов в порядке первого появления в листе"""
+        return [
+            r[0] for r in self.conn.execute(
+                """SELECT act_number FROM works WHERE act_number != ''
+                   GROUP BY act_number ORDER BY MIN(row_id)"""
+            )
+        ]
+
+    def act_rows(self, act_number: str, status_filter: str = '') -> List[List]:
+        """Строки акта (индекс act_number), опционально с фильтром статуса"""
+        sql = "SELECT cells FROM works WHERE act_number = ?"
+        params = [normalize_act_number(act_number)]
+        if status_filter:
+            sql += " AND instr(status, ?) > 0"
+            params.append(status_filter.lower())
+        sql += " ORDER BY row_id"
+        return [
+            [_decode_value(v) for v in json.loads(r[0])]
+            for r in self.conn.execute(sql, params)
+        ]
+
+    def sorted_rows(self) -> List[Tuple[int, List]]:
+        """Все строки (номер строки, значения): по дате начала работ, без даты в конце"""
+        return [
+            (r[0], [_decode_value(v) for v in json.loads(r[1])])
+            for r in self.conn.execute(
+                "SELECT row_id, cells FROM works ORDER BY start_date IS NULL, start_date, row_id"
+            )
+        ]
+
+    # --- обмен с data.xlsx ---
+
+    def import_excel(self, excel_file: str, force: bool = False) -> bool:
+        """
+        Построить хранилище из data.xlsx
+
+        data.xlsx остаётся главным для ручных колонок (номер акта, даты,
+        примечания), поэтому если файл изменился с последней выгрузки,
+        строки хранилища заменяются строками файла. Если файл не менялся,
+        импорт пропускается.
+
+        Returns:
+            True если строки были перечитаны из файла
+        """
+        source_hash = file_hash(excel_file)
+        if not force and self.get_meta('source_hash') == source_hash:
+            logger.info(f"✅ Хранилище актуально ({self.count()} строк), импорт пропущен")
+            return False
+
+        logger.info(f"Импорт {excel_file} → {self.db_path}")
+        wb = openpyxl.load_workbook(excel_file, read_only=True)
+        ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+
+        rows = {}
+        headers = None
+        for row_idx, values in enumerate(
+            ws.iter_rows(max_col=NUM_COLUMNS, values_only=True), start=1
+        ):
+            values = list(values) + [None] * (NUM_COLUMNS - len(values))
+            if row_idx == 1:
+                headers = [str(v) if v is not None else f'col_{i}' for i, v in enumerate(values, 1)]
+                continue
+            if all(v is None for v in values):
+                continue
+            rows[row_idx] = values
+        wb.close()
+
+        self.conn.execute("DELETE FROM works")
+        self.put_rows(rows)
+        if headers:
+            self.set_meta('headers', json.dumps(headers, ensure_ascii=False))
+        self.set_meta('source_hash', source_hash)
+        self.conn.commit()
+        self._sheet = None
+
+        logger.info(f"✅ Импортировано строк: {len(rows)}")
+        return True
+
+    def render_excel(self, excel_file: str):
+        """
+        Выгрузить хранилище в data.xlsx (лист "Работы"), упорядочив строки
+        по дате начала работ. Остальные листы не трогаются.
+        Номера строк в хранилище приводятся к порядку в файле.
+
+        Как в full_sync.sort_excel_by_date, вместе со значением переносится
+        оформление ячейки (шрифт, заливка, рамка, выравнивание, формат
+        числа). Книга читается с формулами (без data_only - иначе при
+        сохранении формулы всех листов заменятся значениями), поэтому
+        формулы строк (колонка G: =VLOOKUP(F<строка>, ...)) сдвигаются
+        на новую строку.
+
+        Строки, которых в файле ещё нет (добавлены из Trello), получают
+        оформление соседней строки выше. Значение пишется после формата,
+        так что дата в ячейке с форматом General получает формат даты
+        openpyxl, а не сохраняется числом.
+        """
+        if self._sheet is not None:
+            self._sheet.flush()
+
+        sorted_rows = self.sorted_rows()
+
+        wb = openpyxl.load_workbook(excel_file)
+        ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+
+        # Оформление исходных строк - до перезаписи, только для строк из файла
+        source_rows = {
+            row_idx for row_idx, values in enumerate(
+                ws.iter_rows(min_row=2, max_col=NUM_COLUMNS, values_only=True), start=2)
+            if any(v is not None for v in values)
+        }
+        styles = {}
+        for row_id, _ in sorted_rows:
+            if row_id not in source_rows:
+                continue
+            styles[row_id] = [
+                {
+                    'font': copy(cell.font),
+                    'fill': copy(cell.fill),
+                    'border': copy(cell.border),
+                    'alignment': copy(cell.alignment),
+                    'number_format': cell.number_format,
+                }
+                for cell in (ws.cell(row_id, col_idx) for col_idx in range(1, NUM_COLUMNS + 1))
+            ]
+
+        rows = []
+        # Соседняя строка для новых строк: предыдущая из файла (для первых - первая из файла)
+        neighbour = next((styles[row_id] for row_id, _ in sorted_rows if row_id in styles), None)
+        for row_idx, (row_id, values) in enumerate(sorted_rows, start=2):
+            values = [_move_formula(value, row_id, row_idx) for value in values]
+            rows.append(values)
+            row_styles = styles.get(row_id, neighbour)
+            if row_id in styles:
+                neighbour = row_styles
+            for col_idx, value in enumerate(values, start=1):
+                cell = ws.cell(row_idx, col_idx)
+                if row_styles:
+                    style = row_styles[col_idx - 1]
+                    cell.font = style['font']
+                    cell.fill = style['fill']
+                    cell.border = style['border']
+                    cell.alignment = style['alignment']
+                    cell.number_format = style['number_format']
+                cell.value = value
+
+        for row_idx in range(len(rows) + 2, ws.max_row + 1):
+            for col_idx in range(1, NUM_COLUMNS + 1):
+                ws.cell(row_idx, col_idx).value = None
+        wb.save(excel_file)
+
+        # Строки хранилища = строки файла
+        self.conn.execute("DELETE FROM works")
+        self.put_rows({row_idx: values for row_idx, values in enumerate(rows, start=2)})
+        self.set_meta('source_hash', file_hash(excel_file))
+        self.conn.commit()
+        self._sheet = None
+
+        logger.info(f"✅ Excel перерисован из хранилища: {excel_file} ({len(rows)} строк)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='SQLite-хранилище листа "Работы"')
+    parser.add_argument('--db', required=True, help='Путь к SQLite файлу')
+    parser.add_argument('--file', required=True, help='Путь к Excel файлу')
+    parser.add_argument('--render', action='store_true', help='Выгрузить хранилище в Excel')
+    parser.add_argument('--force', action='store_true', help='Перечитать Excel даже без изменений')
+    args = parser.parse_args()
+
+    store = WorksStore(args.db)
+    if args.render:
+        store.render_excel(args.file)
+    else:
+        store.import_excel(args.file, force=args.force)
+    store.close()